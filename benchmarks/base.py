@@ -0,0 +1,141 @@
+"""
+Shared setup for the benchmarks.
+
+Each benchmark runs against the bundled mock_project, in a throwaway test
+database, so run them from the project root:
+    python -m benchmarks.item_loading
+"""
+
+import os
+import resource
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mock_project.settings')
+
+from django.core.signals import request_started
+from django.db import connection, models, reset_queries
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from flexible_content.models import BaseItem
+
+
+def make_extra_types(count):
+    """
+    Create `count` throwaway item types, so we can see how the number of types
+    affects things. This has to happen before the test database is created.
+    """
+    extra_types = []
+    for n in range(count):
+        name = 'BenchmarkItem{}'.format(n)
+        meta = type('Meta', (object,), {'app_label': 'test_app'})
+        attrs = {
+            '__module__': 'mock_project.test_app.models',
+            'text': models.TextField(),
+            'Meta': meta,
+        }
+        extra_types.append(type(name, (BaseItem,), attrs))
+    return extra_types
+
+
+class TestDatabase(object):
+    """
+    Create a test database on the way in, and destroy it on the way out.
+    """
+
+    def __enter__(self):
+        setup_test_environment()
+        self.old_name = connection.creation.create_test_db(verbosity=0)
+        # Record queries even though DEBUG might be off, and keep counting
+        # through requests made with the test client, which would otherwise
+        # clear them.
+        connection.use_debug_cursor = True
+        request_started.disconnect(reset_queries)
+        return self
+
+    def __exit__(self, *exc_info):
+        request_started.connect(reset_queries)
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def make_item(model, area, ordering, **values):
+    """
+    Create an item of the given type, filling in its own fields with dummy
+    data (or the given values).
+    """
+    item = model(content_area=area, ordering=ordering)
+    for field in model._meta.local_fields:
+        if field.name in values:
+            setattr(item, field.attname, values[field.name])
+            continue
+        if field.auto_created or field.rel:
+            continue
+        if isinstance(field, models.FileField):
+            setattr(item, field.attname, 'benchmark.txt')
+        elif isinstance(field, models.IntegerField):
+            setattr(item, field.attname, ordering)
+        elif isinstance(field, (models.CharField, models.TextField)):
+            setattr(item, field.attname, 'Benchmark item {}'.format(ordering))
+    item.save()
+    return item
+
+
+def make_area(area_model, item_types, item_count):
+    """
+    Create an area with `item_count` items, cycling through the given types.
+    """
+    area = area_model.objects.create(title="Benchmark")
+    for n in range(item_count):
+        make_item(item_types[n % len(item_types)], area, n + 1)
+    return area
+
+
+def measure(func, repeat=5):
+    """
+    Call func `repeat` times, and return the best and median wall times (in
+    seconds) and the number of queries a single call made.
+    """
+    times = []
+    for n in range(repeat):
+        queries_before = len(connection.queries)
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+        queries = len(connection.queries) - queries_before
+    times.sort()
+    return {'seconds': times[0], 'median_seconds': times[len(times) // 2],
+            'queries': queries}
+
+
+def measure_memory(func):
+    """
+    Call func once more, and return a tuple of how much memory it used at its
+    peak (in KiB) and how that was measured.
+
+    tracemalloc (Python 3.4+) counts exactly what the call allocated. Without
+    it, all we have is the process's peak resident size, which only shows how
+    much the call pushed that peak up (often not at all), so compare those
+    numbers with care.
+    """
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak // 1024, 'tracemalloc'
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func()
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB; OS X reports bytes.
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return (after - before) // scale, 'max_rss_growth'
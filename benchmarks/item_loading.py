@@ -0,0 +1,83 @@
+"""
+Compare joined and split item loading as the number of item types grows.
+
+Joined loading (select_subclasses) LEFT JOINs every item type's table, no
+matter which types an area actually holds. Split loading runs a narrow query
+per type instead. This creates an area holding a couple of types, adds more
+and more unrelated types to the project, and times loading the area both
+ways:
+    python -m benchmarks.item_loading --items 200 --present-types 2
+
+Each type count runs in its own process, since item types can't be removed
+once they're defined.
+"""
+
+import optparse
+import subprocess
+import sys
+
+from .base import TestDatabase, make_area, make_extra_types, measure
+
+
+def run_once(extra_type_count, item_count, present_type_count, repeat):
+    """
+    Time both strategies with the given number of extra types defined, and
+    print a single row of results.
+    """
+    make_extra_types(extra_type_count)
+
+    from django.db.models import get_models
+    from flexible_content.models import BaseItem
+    from flexible_content.utils import JOINED_LOADING, SPLIT_LOADING
+    from mock_project.test_app.models import MyArea
+
+    with TestDatabase():
+        item_types = [m for m in get_models() if issubclass(m, BaseItem) and
+                      m is not BaseItem]
+        area = make_area(MyArea, item_types[:present_type_count], item_count)
+
+        results = []
+        for loading in (JOINED_LOADING, SPLIT_LOADING):
+            load = lambda: list(BaseItem.objects.get_for_area(area, loading))
+            results.append(measure(load, repeat))
+
+    print('{:>6} {:>6} {:>10.2f} {:>8} {:>10.2f} {:>8}'.format(
+        len(item_types), item_count,
+        results[0]['seconds'] * 1000, results[0]['queries'],
+        results[1]['seconds'] * 1000, results[1]['queries']))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--items', type='int', default=200,
+                      help="How many items the area should hold.")
+    parser.add_option('--present-types', type='int', default=2,
+                      help="How many types the area's items should use.")
+    parser.add_option('--max-extra-types', type='int', default=15,
+                      help="Go up to this many extra item types.")
+    parser.add_option('--step', type='int', default=5)
+    parser.add_option('--repeat', type='int', default=5)
+    parser.add_option('--extra-types', type='int', default=None,
+                      help="Only run with this many extra types.")
+    options, args = parser.parse_args()
+
+    if options.extra_types is not None:
+        run_once(options.extra_types, options.items, options.present_types,
+                 options.repeat)
+        return
+
+    print('{:>6} {:>6} {:>10} {:>8} {:>10} {:>8}'.format(
+        'types', 'items', 'joined ms', 'queries', 'split ms', 'queries'))
+    sys.stdout.flush()
+    for count in range(0, options.max_extra_types + 1, options.step):
+        subprocess.check_call([
+            sys.executable, '-m', 'benchmarks.item_loading',
+            '--extra-types', str(count),
+            '--items', str(options.items),
+            '--present-types', str(options.present_types),
+            '--repeat', str(options.repeat),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Measure the main code paths against synthetic areas, and save the results as
+JSON so releases can be compared:
+    python -m benchmarks.suite --items 10,100,500 --output results.json
+    python -m benchmarks.suite --compare old.json --output new.json
+
+For each area size, this times:
+    get_for_area          loading (and downcasting) the area's items
+    get_rendered_content  rendering the whole area, with caching off
+    fc_get_forms          building the admin's item forms for the change page
+    change_view_post      submitting the change page with every item edited
+
+and records the best and median wall times, the number of queries one call
+makes, and how much memory one call needs at its peak.
+
+The areas hold a mix of PlainText, RawHTML, Image, Video and test_app.MyItem
+items; change the proportions with --mix, e.g. --mix plain-text=3,video=1.
+Any other FLEXIBLE_CONTENT settings can be given as JSON with --settings, e.g.
+--settings '{"ITEM_LOADING": "split"}'.
+"""
+
+from __future__ import print_function
+
+import json
+import optparse
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from .base import TestDatabase, make_item, measure, measure_memory
+
+
+ITEM_TYPES = (
+    'default_item_types.PlainText',
+    'default_item_types.RawHTML',
+    'default_item_types.Image',
+    'default_item_types.Video',
+    'test_app.MyItem',
+)
+DEFAULT_MIX = 'plain-text=1,raw-html=1,image=1,video=1,my-item=1'
+# Field values the dummy data won't do for, by type slug.
+ITEM_VALUES = {
+    'video': {'service': 'vimeo', 'video_id': '59338758'},
+}
+BENCHMARKS = ('get_for_area', 'get_rendered_content', 'fc_get_forms',
+              'change_view_post')
+
+
+def parse_mix(mix):
+    """
+    Turn 'plain-text=3,video=1' into [('plain-text', 3), ('video', 1)].
+    """
+    parsed = []
+    for part in mix.split(','):
+        slug, equals, weight = part.partition('=')
+        try:
+            parsed.append((slug.strip(), int(weight or 1)))
+        except ValueError:
+            raise optparse.OptionValueError(
+                "Couldn't understand {!r} in --mix.".format(part))
+    return parsed
+
+
+def make_mixed_area(mix, item_count):
+    """
+    Create an area with `item_count` items, spread over the types in the
+    mix, interleaved the way an editor might.
+    """
+    from flexible_content.registry import get_item_types
+    from mock_project.test_app.models import MyArea
+
+    models_by_slug = dict((t.slug, t.model) for t in get_item_types())
+    pattern = []
+    for slug, weight in mix:
+        if slug not in models_by_slug:
+            raise optparse.OptionValueError(
+                "Unknown item type {!r} in --mix. Choose from: {}.".format(
+                    slug, ', '.join(sorted(models_by_slug))))
+        pattern.extend([slug] * weight)
+
+    area = MyArea.objects.create(title="Benchmark")
+    for n in range(item_count):
+        slug = pattern[n % len(pattern)]
+        make_item(models_by_slug[slug], area, n + 1,
+                  **ITEM_VALUES.get(slug, {}))
+    return area
+
+
+def get_change_data(admin, request, area):
+    """
+    Build the POST data for the area's change page, as the browser would
+    send it, but with every item's text edited (and no fingerprints), so
+    every item is validated and saved.
+    """
+    per_page = admin.fc_items_per_page
+    admin.fc_items_per_page = None
+    try:
+        forms = admin.fc_get_forms(request, obj=area)
+    finally:
+        admin.fc_items_per_page = per_page
+
+    data = {
+        'title': area.title,
+        'fc-prefixes': ','.join(f.prefix for f in forms),
+    }
+    for f in forms:
+        data[f.add_prefix('pk')] = f.instance.pk
+        data[f.add_prefix('ct')] = f.instance.get_content_type().pk
+        data[f.add_prefix('delete')] = 0
+        for bound_field in f:
+            if bound_field.name in ('fingerprint', 'pk', 'ct', 'delete'):
+                continue
+            # Unchecked boxes and untouched file inputs aren't sent.
+            value = bound_field.value()
+            if value is None or value is False or hasattr(value, 'url'):
+                continue
+            if bound_field.name in ('text', 'html'):
+                value = u'{} (edited)'.format(value)
+            data[bound_field.html_name] = value
+            if bound_field.field.show_hidden_initial:
+                data[bound_field.html_initial_name] = value
+    return data
+
+
+def run(item_counts, mix, repeat, extra_settings):
+    from django.conf import settings
+    from django.contrib.admin import autodiscover, site
+    from django.contrib.auth.models import User
+    from django.test.client import Client, RequestFactory
+    from django.test.utils import override_settings
+
+    from flexible_content.models import BaseItem
+    from mock_project.test_app.models import MyArea
+
+    app_settings = {
+        'ITEM_TYPES': ITEM_TYPES,
+        # Don't go looking videos up online.
+        'VIDEO_VALIDATOR': ('flexible_content.default_item_types.'
+                            'video_validators.LocalVideoValidator'),
+    }
+    app_settings.update(extra_settings)
+    autodiscover()
+
+    results = []
+    with TestDatabase(), override_settings(FLEXIBLE_CONTENT=app_settings,
+                                           ALLOWED_HOSTS=['*']):
+        User.objects.create_superuser('benchmark', 'benchmark@example.com',
+                                      'benchmark')
+        client = Client()
+        client.login(username='benchmark', password='benchmark')
+        admin = site._registry[MyArea]
+
+        for item_count in item_counts:
+            area = make_mixed_area(mix, item_count)
+            url = '/admin/test_app/myarea/{}/'.format(area.pk)
+            request = RequestFactory().get(url)
+            post_data = get_change_data(admin, request, area)
+
+            def get_for_area():
+                list(BaseItem.objects.get_for_area(area))
+
+            def get_rendered_content():
+                area.rendered_content = None
+                area.get_rendered_content()
+
+            def fc_get_forms():
+                admin.fc_get_forms(request, obj=area)
+
+            def change_view_post():
+                response = client.post(url, post_data)
+                if response.status_code != 302:
+                    raise AssertionError(
+                        "The change page didn't save (status {}).".format(
+                            response.status_code))
+
+            funcs = {
+                'get_for_area': get_for_area,
+                'get_rendered_content': get_rendered_content,
+                'fc_get_forms': fc_get_forms,
+                'change_view_post': change_view_post,
+            }
+            for name in BENCHMARKS:
+                func = funcs[name]
+                result = measure(func, repeat)
+                memory, method = measure_memory(func)
+                result.update({
+                    'benchmark': name,
+                    'items': item_count,
+                    'peak_memory_kb': memory,
+                    'memory_method': method,
+                })
+                results.append(result)
+                print_result(result)
+
+    return {
+        'meta': get_meta(mix, repeat, app_settings, settings),
+        'results': results,
+    }
+
+
+def get_meta(mix, repeat, app_settings, settings):
+    import django
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.utcnow().isoformat() + 'Z',
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'mix': dict(mix),
+        'repeat': repeat,
+        'settings': app_settings,
+    }
+
+
+def print_result(result, baseline=None):
+    line = '{:<22} {:>6} {:>10.2f} {:>8} {:>10}'.format(
+        result['benchmark'], result['items'], result['seconds'] * 1000,
+        result['queries'], result['peak_memory_kb'])
+    if baseline is not None:
+        line += ' {:>8.2f}x'.format(result['seconds'] / baseline['seconds']
+                                    if baseline['seconds'] else 0)
+    print(line)
+    sys.stdout.flush()
+
+
+def compare(old, new):
+    """
+    Print the new results next to how long they took relative to the old
+    ones (above 1 is slower).
+    """
+    old_results = dict(((r['benchmark'], r['items']), r)
+                       for r in old['results'])
+    print()
+    print('Compared with {} ({}):'.format(old['meta'].get('commit'),
+                                          old['meta'].get('date')))
+    for result in new['results']:
+        baseline = old_results.get((result['benchmark'], result['items']))
+        if baseline is not None:
+            print_result(result, baseline)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--items', default='10,100,500',
+                      help="Comma-separated area sizes to try.")
+    parser.add_option('--mix', default=DEFAULT_MIX,
+                      help="Item types and their proportions, by slug.")
+    parser.add_option('--repeat', type='int', default=5)
+    parser.add_option('--settings', default='{}',
+                      help="Extra FLEXIBLE_CONTENT settings, as JSON.")
+    parser.add_option('--output', default=None,
+                      help="Write the results to this JSON file.")
+    parser.add_option('--compare', default=None,
+                      help="Compare with results saved by an earlier run.")
+    options, args = parser.parse_args()
+
+    try:
+        item_counts = [int(n) for n in options.items.split(',')]
+        mix = parse_mix(options.mix)
+        extra_settings = json.loads(options.settings)
+    except (ValueError, optparse.OptionValueError) as e:
+        parser.error(str(e))
+
+    print('{:<22} {:>6} {:>10} {:>8} {:>10}'.format(
+        'benchmark', 'items', 'best ms', 'queries', 'peak KiB'))
+    try:
+        results = run(item_counts, mix, options.repeat, extra_settings)
+    except optparse.OptionValueError as e:
+        parser.error(str(e))
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
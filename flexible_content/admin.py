@@ -19,16 +19,36 @@ Ideally, this would be redone in the future to be more elegant - perhaps
 replacing the views altogether, or allowing front-end editing via an API.
 """
 
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime
+
 from django import forms
+from django.conf.urls import patterns, url
 from django.contrib import admin
 from django.contrib.admin.util import unquote
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.urlresolvers import reverse
 from django.db import models, transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.utils import six, timezone
+from django.utils.cache import patch_cache_control
+from django.utils.datastructures import MultiValueDict
 from django.utils.decorators import method_decorator
-from django.utils.translation import ugettext as _
+from django.utils.translation import get_language, ugettext as _
 from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import condition
 
-from .models import BaseItem, TemporaryArea
+from .cache import invalidate_after_commit
+from .instrumentation import instrumented
+from .models import SPLIT_LOADING_BATCH_SIZE, BaseItem
+from .registry import get_item_types
+from .rendering import get_template_mtime, template_cache_enabled
+from .snapshots import area_changed, deferred_rebuilds
+from .utils import SPLIT_LOADING, get_item_loading, iter_chunks
 
 
 csrf_protect_m = method_decorator(csrf_protect)
@@ -36,6 +56,15 @@ csrf_protect_m = method_decorator(csrf_protect)
 FORM_PREFIX_TEMPLATE = 'fc-item-{counter}'
 FORM_PREFIX_PLACEHOLDER = 'PLACEHOLDER'
 
+# The blank item forms are served from a URL that changes whenever they do,
+# so browsers can hold on to them for as long as they like.
+FORM_TEMPLATES_MAX_AGE = 60 * 60 * 24 * 365
+
+# The rendered blank item forms, by language, since their labels and help
+# text are translated. Only the latest version for each language is kept;
+# see ContentAreaAdmin.fc_get_form_templates.
+_form_templates = {}
+
 
 def get_form_prefix(counter=FORM_PREFIX_PLACEHOLDER):
     return FORM_PREFIX_TEMPLATE.format(counter=counter)
@@ -79,7 +108,17 @@ class ContentAreaAdmin(admin.ModelAdmin):
     change_form_template = 'flexible-content/change-form.html'
     save_on_top = True
 
+    # Save items with as few statements as possible, rather than one save or
+    # delete per item. See fc_bulk_save_forms.
+    fc_bulk_save = False
+
+    # How many item forms to show when the change page loads. The rest are
+    # fetched as the editor scrolls down (see fc_item_forms_view), and only
+    # the ones that were loaded are submitted. None loads them all at once.
+    fc_items_per_page = 50
+
     @csrf_protect_m
+    @invalidate_after_commit()
     @transaction.commit_on_success
     def add_view(self, request, form_url='', extra_context=None):
         """
@@ -91,24 +130,27 @@ class ContentAreaAdmin(admin.ModelAdmin):
             extra_context = {}
         extra_context = self.fc_get_context(request)
 
-        # Save the items they submitted.
-        temp_area = None
+        # Validate the items they submitted. The area doesn't exist yet, so
+        # they can't be saved until it does.
         if request.method == 'POST':
-            temp_area = self.fc_save_items(request,
-                                           forms=extra_context['fc_forms'])
+            self.fc_validate_items(request, forms=extra_context['fc_forms'])
 
         # Call ModelAdmin's add_view.
         response = (super(ContentAreaAdmin, self).
                     add_view(request, form_url, extra_context))
 
-        # If the above object was saved, attach our items and save them.
+        # If the above object was saved, save our items to it. Its snapshot
+        # (if any) is built once they're all in.
         new_area = getattr(request, 'new_content_area_object', None)
-        if temp_area is not None and new_area is not None:
-            temp_area.migrate_items_to(new_area)
+        if new_area is not None:
+            with deferred_rebuilds():
+                self.fc_save_new_items(new_area,
+                                       forms=extra_context['fc_forms'])
 
         return response
 
     @csrf_protect_m
+    @invalidate_after_commit()
     @transaction.commit_on_success
     def change_view(self, request, object_id, form_url='', extra_context=None):
         """
@@ -122,9 +164,12 @@ class ContentAreaAdmin(admin.ModelAdmin):
             extra_context = {}
         extra_context = self.fc_get_context(request, obj)
 
+        # Rebuild the area's snapshot (if any) once, after all of its items
+        # are saved, rather than after each one.
         if request.method == 'POST':
-            self.fc_save_items(request, area=obj,
-                               forms=extra_context['fc_forms'])
+            with deferred_rebuilds():
+                self.fc_save_items(request, area=obj,
+                                   forms=extra_context['fc_forms'])
 
         # Call ModelAdmin's add_view.
         response = (super(ContentAreaAdmin, self).
@@ -132,88 +177,469 @@ class ContentAreaAdmin(admin.ModelAdmin):
 
         return response
 
-    def fc_save_items(self, request, area=None, forms=None):
-        """
-        For each form, create/update objects.
+    @instrumented('admin.save_items',
+                  lambda result, self, request, area, forms=None:
+                  [f.instance for f in forms or ()])
+    def fc_save_items(self, request, area, forms=None):
         """
-        all_items_validated = True
+        For each form, create/update/delete the items of an area that already
+        exists. (A new area's items are handled by fc_validate_items and
+        fc_save_new_items instead.)
 
-        # If the current area doesn't exist yet, create a temporary one to save
-        # the items to.
-        if area is None:
-            using_temp_area = True
-            area = TemporaryArea.objects.create()
-        else:
-            using_temp_area = False
-
-        # If there are any forms, loop through them.
-        if len(forms):
-            # We'll need the data on the area we're saving it to.
-            area_ct = area.get_content_type().pk
-            area_id = area.pk
-
-            for f in forms:
-
-                # If this form's data includes a non-zero value for the delete
-                # field, they want it deleted.
-                if f.should_be_deleted():
-                    # We only need to actively delete it if it's already in
-                    # the database.
-                    if f.already_exists():
-                        f.instance.delete()
-                    # Don't do anything else, if they didn't want their changes
-                    # saved.
-                    continue
-
-                # Ensure that the object we're saving is assigned to the proper
-                # area, especially if the real content area doesn't exist yet.
+        All of the items are validated before anything is written, so if any
+        of them don't validate, the area is left just as it was.
+        """
+        # We'll need the data on the area we're saving it to.
+        area_ct = area.get_content_type().pk
+        area_id = area.pk
+
+        # Ensure that the objects we're saving are assigned to the proper
+        # area.
+        self.fc_assign_area(forms, area_ct, area_id)
+
+        # In bulk mode, items that only moved are reordered without being
+        # validated in full (see fc_bulk_save_forms).
+        orderings = self.fc_get_orderings(forms) if self.fc_bulk_save else {}
+
+        # Deleted items don't need validating, and neither do the ones they
+        # didn't touch. Do any slow checks for the rest all at once, up front,
+        # then check each one, so they all show their errors.
+        changed_forms = [f for f in forms
+                         if not f.should_be_deleted() and
+                         not f.is_unchanged() and
+                         f.instance.pk not in orderings]
+        self.fc_prevalidate(changed_forms)
+        all_items_validated = all([f.is_valid() for f in changed_forms])
+        self.fc_set_items_validated(request, all_items_validated)
+        if not all_items_validated:
+            return
+
+        # If the page didn't load all of the items, make room for the ones
+        # that were.
+        next_offset = request.POST.get('fc-next-offset', '')
+        if next_offset.isdigit():
+            self.fc_shift_unloaded_items(area, forms, int(next_offset))
+
+        # In bulk mode, the forms are saved all together, elsewhere.
+        if self.fc_bulk_save:
+            self.fc_bulk_save_forms(forms, changed_forms, orderings, area_ct,
+                                    area_id)
+            return
+
+        # If this form's data includes a non-zero value for the delete field,
+        # they want it deleted. We only need to actively delete it if it's
+        # already in the database.
+        for f in forms:
+            if f.should_be_deleted() and f.already_exists():
+                f.instance.delete()
+        for f in changed_forms:
+            f.save()
+
+    def fc_assign_area(self, forms, area_ct, area_id):
+        """
+        Point each form that's going to be saved at the given area.
+        """
+        for f in forms:
+            if not f.should_be_deleted():
                 f.data.update({
                     '{}-content_area_ct'.format(f.prefix): area_ct,
                     '{}-content_area_id'.format(f.prefix): area_id,
                 })
 
-                # Save the form.
-                try:
-                    f.save()
-                # Suppress these errors, since the Django admin doesn't catch
-                # them like it does for the forms it knows about. We'll address
-                # this later.
-                except ValueError as e:
-                    all_items_validated = False
-
-        # Set the main area's form validation field based on our assessment
-        # of the items' validation. If this value is zero, it will trigger
-        # the admin to fail validation because we told it items were invalid.
+    def fc_prevalidate(self, forms):
+        """
+        Give each form class a chance to check its forms all at once, before
+        they're validated one by one (see BaseItemForm.prevalidate).
+        """
+        forms_by_class = defaultdict(list)
+        for f in forms:
+            forms_by_class[type(f)].append(f)
+        for form_class, class_forms in forms_by_class.items():
+            prevalidate = getattr(form_class, 'prevalidate', None)
+            if prevalidate is not None:
+                prevalidate(class_forms)
+
+    def fc_shift_unloaded_items(self, area, forms, loaded_count):
+        """
+        Move the items the change page never loaded below the ones it did.
+
+        The page loads items in order, so the first `loaded_count` items (as
+        they were when it loaded) are the ones in the POST. Those are
+        renumbered from 1, and new ones may have been added after them. The
+        rest aren't submitted at all, and are left as they are, except that
+        they're shifted down, keeping their order, if the submitted items now
+        overlap them.
+        """
+        orderings = []
+        for f in forms:
+            if f.should_be_deleted():
+                continue
+            try:
+                orderings.append(int(f.data.get('{}-ordering'.
+                                                format(f.prefix))))
+            except (TypeError, ValueError):
+                pass
+        if not orderings:
+            return
+
+        area_ct = area.get_content_type().pk
+        unloaded = list(BaseItem.objects.
+                        filter(content_area_ct=area_ct,
+                               content_area_id=area.pk).
+                        order_by('ordering', 'pk').
+                        values_list('pk', 'ordering')[loaded_count:])
+        if not unloaded:
+            return
+
+        shift = max(orderings) - min(o for pk, o in unloaded) + 1
+        if shift > 0:
+            unloaded_pks = [pk for pk, o in unloaded]
+            for batch in iter_chunks(unloaded_pks, SPLIT_LOADING_BATCH_SIZE):
+                BaseItem.objects.filter(pk__in=batch).update(
+                    ordering=F('ordering') + shift, modified=timezone.now())
+            area_changed(area_ct, area.pk)
+
+    def fc_set_items_validated(self, request, all_items_validated):
+        """
+        Set the main area's form validation field based on our assessment of
+        the items' validation. If this value is zero, it will trigger the
+        admin to fail validation because we told it items were invalid.
+        """
         request.POST = request.POST.copy()
         request.POST.update({
             'all_items_validated': all_items_validated and '1' or '0',
         })
 
-        # Only return something if we're using a temporary area.
-        if using_temp_area:
-            return area
-        # Otherwise, return nothing.
+    def fc_validate_items(self, request, forms=None):
+        """
+        Validate the forms for a new area's items, without saving anything.
+        Once the area has been saved, fc_save_new_items saves them to it.
+
+        This used to be done by saving the items to a TemporaryArea and
+        moving them over afterwards, which cost a few extra queries per item
+        and left the items behind whenever the area didn't validate.
+        """
+        all_items_validated = True
+
+        # The area doesn't have a primary key yet, so validate the items
+        # against a placeholder. It's replaced before they're saved.
+        area_ct = ContentType.objects.get_for_model(self.model).pk
+        self.fc_assign_area(forms, area_ct, 0)
+
+        # Items that are already marked for deletion won't be saved, so they
+        # don't need to validate.
+        forms = [f for f in forms if not f.should_be_deleted()]
+        self.fc_prevalidate(forms)
+        for f in forms:
+            if not f.is_valid():
+                all_items_validated = False
+
+        self.fc_set_items_validated(request, all_items_validated)
+
+    def fc_save_new_items(self, area, forms=None):
+        """
+        Save the forms checked by fc_validate_items to the area that was just
+        created, in the same transaction.
+        """
+        area_ct = area.get_content_type().pk
+
+        for f in forms:
+            if f.should_be_deleted():
+                continue
+
+            item = f.save(commit=False)
+            item.content_area_ct_id = area_ct
+            item.content_area_id = area.pk
+            # New items can't already be in the database, so skip the check.
+            item.save(force_insert=not f.already_exists())
+            f.save_m2m()
+
+    def fc_get_orderings(self, forms):
+        """
+        Find the existing items whose ordering is the only thing that
+        changed, and return a dictionary mapping their primary keys to their
+        new orderings. Only their ordering is validated (see
+        fc_clean_ordering); if that fails, the item is left out, so the whole
+        form goes through the usual validation instead.
+        """
+        orderings = {}
+        for f in forms:
+            if (f.already_exists() and not f.should_be_deleted() and
+                    not f.is_unchanged() and
+                    f.get_changed_fields() == ['ordering']):
+                ordering = self.fc_clean_ordering(f)
+                if ordering is not None:
+                    orderings[f.instance.pk] = ordering
+        return orderings
+
+    def fc_bulk_save_forms(self, forms, changed_forms, orderings, area_ct,
+                           area_id):
+        """
+        Save the items' forms like fc_save_items does, once they've been
+        validated, but in bulk:
+
+        - Every deleted item goes in one queryset delete.
+        - Items that come back unchanged are skipped, like they normally are.
+        - Items whose ordering is the only thing that changed (`orderings`,
+          from fc_get_orderings) are reordered with one UPDATE, without being
+          saved individually.
+        - New items are inserted without the existence check that a plain
+          save does first. (Django can't bulk_create models that use
+          multi-table inheritance, so it's still an insert per item.)
+        - Anything else that changed (`changed_forms`) is saved as usual.
+
+        It all happens inside the view's transaction.
+        """
+        deleted_pks = [f.instance.pk for f in forms
+                       if f.should_be_deleted() and f.already_exists()]
+
+        for batch in iter_chunks(deleted_pks, SPLIT_LOADING_BATCH_SIZE):
+            BaseItem.objects.filter(pk__in=batch).delete()
+        BaseItem.objects.bulk_reorder(orderings)
+        for f in changed_forms:
+            if f.already_exists():
+                f.save()
+            else:
+                item = f.save(commit=False)
+                item.save(force_insert=True)
+                f.save_m2m()
+
+        # Deleting in bulk skips the items' own invalidation.
+        if deleted_pks:
+            area_changed(area_ct, area_id)
+
+    def fc_clean_ordering(self, form):
+        """
+        Return the ordering submitted with an item's form as an int, cleaned
+        by the form's field and its clean_ordering() (if it has one), or None
+        if it isn't valid.
+        """
+        field = form.fields.get('ordering')
+        if field is None:
+            return None
+        # Leave the form as it was, in case it's validated properly later.
+        missing = object()
+        cleaned_data = getattr(form, 'cleaned_data', missing)
+        try:
+            ordering = field.clean(form['ordering'].data)
+            if hasattr(form, 'clean_ordering'):
+                form.cleaned_data = {'ordering': ordering}
+                ordering = form.clean_ordering()
+        except ValidationError:
+            return None
+        finally:
+            if cleaned_data is missing:
+                form.__dict__.pop('cleaned_data', None)
+            else:
+                form.cleaned_data = cleaned_data
+        if isinstance(ordering, bool) or not isinstance(ordering,
+                                                        six.integer_types):
+            return None
+        return ordering
+
+    def get_urls(self):
+        """
+        Add the URL for the blank item forms in front of ModelAdmin's URLs.
+        """
+        view = self.admin_site.admin_view(self.fc_form_templates_view,
+                                          cacheable=True)
+        urls = patterns('',
+            url(r'^fc-form-templates\.js$', view,
+                name=self.fc_get_url_name('fc_form_templates')),
+            url(r'^(.+)/fc-item-forms/$',
+                self.admin_site.admin_view(self.fc_item_forms_view),
+                name=self.fc_get_url_name('fc_item_forms')),
+        )
+        return urls + super(ContentAreaAdmin, self).get_urls()
+
+    def fc_get_url_name(self, view_name):
+        opts = self.model._meta
+        return '{}_{}_{}'.format(opts.app_label, opts.module_name, view_name)
+
+    def fc_get_form_templates_url(self):
+        """
+        Return the URL of the blank item forms, with their current version
+        tacked on so that browsers fetch them again when they change.
+        """
+        path = reverse('admin:' + self.fc_get_url_name('fc_form_templates'),
+                       current_app=self.admin_site.name)
+        etag, last_modified, javascript = self.fc_get_form_templates()
+        return '{}?v={}'.format(path, etag)
+
+    def fc_get_form_templates(self):
+        """
+        Render the blank form for each configured item type into a
+        JavaScript object, `fcFormTemplates`, keyed by type slug. base.js
+        copies these when someone adds an item.
+
+        Return a tuple of (etag, last_modified, javascript). It's rendered
+        once for each language, and again when the item types change. The
+        language is part of the ETag (and so the URL's version), so a browser
+        never holds on to another language's forms.
+
+        Templates are only reloaded when the template cache is off (as it is
+        under DEBUG; see rendering.template_cache_enabled), so that's the only
+        time it's worth checking whether the forms' templates were edited.
+        """
+        item_types = get_item_types()
+        language = get_language()
+        cached_types, mtimes, form_templates = _form_templates.get(
+            language, (None, None, None))
+
+        stale = cached_types != item_types
+        if not stale and not template_cache_enabled():
+            stale = self.fc_get_form_template_mtimes(item_types) != mtimes
+        if stale:
+            mtimes = self.fc_get_form_template_mtimes(item_types)
+            templates = dict((t.slug,
+                              t.instance.get_form_template().as_content_item())
+                             for t in item_types)
+            javascript = 'var fcFormTemplates = {};\n'.format(
+                json.dumps(templates, sort_keys=True))
+            etag = hashlib.md5(u'{}\n{}'.format(language, javascript).
+                               encode('utf-8')).hexdigest()
+            known_mtimes = [m for m in mtimes if m is not None]
+            if known_mtimes:
+                last_modified = datetime.utcfromtimestamp(max(known_mtimes))
+            else:
+                last_modified = None
+
+            form_templates = (etag, last_modified, javascript)
+            _form_templates[language] = (item_types, mtimes, form_templates)
+        return form_templates
+
+    def fc_get_form_template_mtimes(self, item_types):
+        """
+        Return the modification times of the templates the item types' forms
+        are rendered with, in order of their names.
+        """
+        template_names = set(getattr(t.form_class, 'content_item_template',
+                                     None) for t in item_types)
+        template_names.discard(None)
+        return tuple(get_template_mtime(n) for n in sorted(template_names))
+
+    def fc_form_templates_view(self, request):
+        """
+        Serve the blank item forms as JavaScript, with an ETag and
+        Last-Modified header, so they don't have to be inlined in (and
+        rendered for) every add and change page.
+        """
+        etag, last_modified, javascript = self.fc_get_form_templates()
+
+        @condition(etag_func=lambda request: etag,
+                   last_modified_func=lambda request: last_modified)
+        def view(request):
+            return HttpResponse(javascript,
+                                content_type='application/javascript')
+        response = view(request)
+
+        # If they asked for this exact version, it'll never change. Otherwise,
+        # make them check back each time.
+        if request.GET.get('v') == etag:
+            max_age = FORM_TEMPLATES_MAX_AGE
         else:
+            max_age = 0
+        patch_cache_control(response, private=True, max_age=max_age)
+        return response
+
+    def fc_item_forms_view(self, request, object_id):
+        """
+        Return a page of an area's item forms as JSON, for base.js to add to
+        the change page as the editor scrolls down. Takes these parameters:
+            offset: How many of the area's items to skip.
+            prefix_start: The number to start the forms' prefixes at, so they
+                don't clash with forms already on the page.
+
+        The response has the forms' HTML and the offset of the next page,
+        which is null if this was the last one.
+        """
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404
+        if not self.has_change_permission(request, obj):
+            raise PermissionDenied
+
+        try:
+            offset = int(request.GET.get('offset', 0))
+            prefix_start = int(request.GET.get('prefix_start', 1))
+        except ValueError:
+            return HttpResponseBadRequest()
+        if offset < 0 or prefix_start < 1:
+            return HttpResponseBadRequest()
+
+        forms, next_offset = self.fc_get_item_forms_page(obj, offset,
+                                                         prefix_start)
+        data = {
+            'html': ''.join(f.as_content_item() for f in forms),
+            'next_offset': next_offset,
+        }
+        return HttpResponse(json.dumps(data), content_type='application/json')
+
+    def fc_get_item_forms_page(self, obj, offset=0, prefix_start=1):
+        """
+        Return a tuple of (forms, next_offset) for a page of an area's items,
+        starting `offset` items in. next_offset is None if there aren't any
+        more.
+        """
+        limit = self.fc_items_per_page
+        if limit is None:
+            items = list(obj.items[offset:])
+            next_offset = None
+        else:
+            # Ask for one extra, to see whether there's another page.
+            items = list(obj.items[offset:offset + limit + 1])
+            next_offset = offset + limit if len(items) > limit else None
+            items = items[:limit]
+
+        forms = [i.get_form(prefix=get_form_prefix(prefix_start + n))
+                 for n, i in enumerate(items)]
+        return forms, next_offset
+
+    def fc_get_next_offset(self, request, obj=None):
+        """
+        Where should the change page pick up loading more items from? None
+        means they've all been loaded.
+        """
+        if request.method == 'POST':
+            next_offset = request.POST.get('fc-next-offset', '')
+            return int(next_offset) if next_offset.isdigit() else None
+        if obj is None or self.fc_items_per_page is None:
             return None
+        if obj.items.count() > self.fc_items_per_page:
+            return self.fc_items_per_page
+        return None
 
     def fc_get_context(self, request, obj=None):
         """
         Add flexible_content context we'll need for add_view and change_view.
         """
+        if obj is not None:
+            item_forms_url = reverse(
+                'admin:' + self.fc_get_url_name('fc_item_forms'),
+                args=[obj.pk], current_app=self.admin_site.name)
+        else:
+            item_forms_url = None
+
         return {
-            'fc_types': [t() for t in BaseItem.get_configured_types()],
+            'fc_types': [t.instance for t in get_item_types()],
             'fc_forms': self.fc_get_forms(request, obj=obj),
             'fc_form_prefix_placeholder': FORM_PREFIX_PLACEHOLDER,
+            'fc_form_templates_url': self.fc_get_form_templates_url(),
+            'fc_item_forms_url': item_forms_url,
+            'fc_next_offset': self.fc_get_next_offset(request, obj=obj),
         }
 
     def fc_get_form_model_by_prefix(self, request, prefix):
         # Try to load the model class via the ContentType they suggested.
         ct_pk = request.POST.get('{}-ct'.format(prefix), None)
         try:
-            model_class = ContentType.objects.get(pk=ct_pk).model_class()
+            # ContentType caches these by ID, so this usually won't hit the
+            # database. Make sure it's an int, though, or it won't match.
+            model_class = (ContentType.objects.get_for_id(int(ct_pk)).
+                           model_class())
         # Be ready for a content type not to exist. Don't worry about the
         # AttributeError - the doesnotexist should be raised first.
-        except ContentType.DoesNotExist:
+        except (ContentType.DoesNotExist, TypeError, ValueError):
             message = ("Form said its type was that of ContentType {}, but "
                        "that ContentType couldn't be found in the "
                        "database.".format(ct_pk))
@@ -235,51 +661,89 @@ class ContentAreaAdmin(admin.ModelAdmin):
         prefixes = [p for p in
                     request.POST.get('fc-prefixes', '').split(',') if p]
 
+        # Load all of the existing items they submitted, at once.
+        pks = [request.POST.get('{}-pk'.format(p), None) for p in prefixes]
+        existing_items = self.fc_get_items_by_pk([pk for pk in pks if pk])
+
+        # Sort the submitted data and files by prefix, in one pass each.
+        form_data = self.fc_partition_by_prefix(request.POST, prefixes)
+        form_files = self.fc_partition_by_prefix(request.FILES, prefixes)
+
         # Loop through each submitted item and process its data.
-        for p in prefixes:
+        for p, pk in zip(prefixes, pks):
 
-            # Check the PK for this prefix
-            pk = request.POST.get('{}-pk'.format(p), None)
-            # If this prefix is for an existing item, load its data.
+            # If this prefix is for an existing item, find its instance.
             instance = None
             if pk:
                 try:
-                    instance = (BaseItem.objects.filter(pk=pk).
-                                select_subclasses()[:1][0])
-                except IndexError:
+                    instance = existing_items[str(pk)]
+                except KeyError:
                     message = ("Form reported update of BaseItem with id {}, "
                                "but no such BaseItem exists.".format(pk))
                     raise ValueError(message)
 
-            # We need to copy the POST data so it can be updated (QueryDicts
-            # are immutable). Plus, there's less redundant data.
-
-            # Append a hypen to the prefix. Django does this in the form, but
-            # we need to prevent getting fc-item-10 when we ask for fc-item-1,
-            # and adding the hyphen will avoid that.
-            search_prefix = '{}-'.format(p)
-            # Assemble a dictionary of only this form's data.
-            this_form_data = dict([(k, v) for (k, v) in request.POST.items()
-                                   if k.startswith(p)])
+            # Each form only gets its own data and files. These are copies,
+            # so they can be updated (QueryDicts are immutable).
+            this_form_data = form_data[p]
+            this_form_files = form_files[p]
 
             # Alright, it's time to create the form! If we found an instance,
             # use that to create it.
             if isinstance(instance, BaseItem):
                 form = instance.get_form(data=this_form_data,
-                                         files=request.FILES, prefix=p)
+                                         files=this_form_files, prefix=p)
             # Otherwise, we'll have to get the model from the content type
             # field first.
             else:
                 model_class = self.fc_get_form_model_by_prefix(request, p)
 
                 form = model_class().get_form(data=this_form_data,
-                                              files=request.FILES, prefix=p)
+                                              files=this_form_files, prefix=p)
 
             # Append the form to the end of the list.
             forms.append(form)
 
         return forms
 
+    def fc_partition_by_prefix(self, data, prefixes):
+        """
+        Split a QueryDict (or any MultiValueDict) into a MultiValueDict per
+        prefix, with a single pass over its keys.
+
+        A key belongs to a prefix if it's that prefix, a hyphen, and a field
+        name, so fc-item-10's data never ends up with fc-item-1's. Field names
+        can't contain hyphens, so everything before the last one is the
+        prefix. Django's hidden initial values (for fields with callable
+        defaults) have 'initial-' in front of that, and are kept too, so the
+        forms can tell whether those fields changed.
+        """
+        buckets = dict((p, MultiValueDict()) for p in prefixes)
+        for key, values in data.lists():
+            prefix, hyphen, field_name = key.rpartition('-')
+            if prefix.startswith('initial-') and prefix not in buckets:
+                prefix = prefix[len('initial-'):]
+            if prefix in buckets:
+                buckets[prefix].setlist(key, values)
+        return buckets
+
+    def fc_get_items_by_pk(self, pks):
+        """
+        Load the items with the given primary keys, casted to their real
+        types, and return them in a dictionary keyed by the string version of
+        their primary keys.
+        """
+        items = {}
+        for batch in iter_chunks(pks, SPLIT_LOADING_BATCH_SIZE):
+            qs = BaseItem.objects.filter(pk__in=batch)
+            if get_item_loading() == SPLIT_LOADING:
+                qs = qs.split_subclasses()
+            else:
+                qs = qs.select_subclasses()
+            items.update((str(i.pk), i) for i in qs)
+        return items
+
+    @instrumented('admin.get_forms',
+                  lambda forms, *args, **kwargs: [f.instance for f in forms])
     def fc_get_forms(self, request, obj=None):
         """
         Use the request to get the forms that should be rendered to the page.
@@ -289,11 +753,10 @@ class ContentAreaAdmin(admin.ModelAdmin):
         # Are they POSTing data, or should we merely get it from the DB?
         if request.method == 'POST':
             forms = self.fc_get_forms_from_POST(request)
-        # If this is a GET on an existing area.
+        # If this is a GET on an existing area, start with the first page of
+        # its items.
         elif obj:
-            for i in obj.items:
-                prefix = get_form_prefix(len(forms) + 1)
-                forms.append(i.get_form(prefix=prefix))
+            forms, next_offset = self.fc_get_item_forms_page(obj)
         # If this is a GET on an area's ADD page.
         else:
             forms = []
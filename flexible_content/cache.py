@@ -0,0 +1,408 @@
+"""
+Cache rendered areas and items so that a page read doesn't need to touch the
+database, and an edited area only needs to re-render what changed.
+
+AREAS
+Each area gets a version token, stored in the cache under a key derived from
+the area's content type and primary key. The rendered HTML is stored next to
+it, along with the token that was current when it was rendered. Whenever an
+item belonging to the area changes, the token is replaced, so any HTML that
+was rendered before the change no longer matches and gets re-rendered.
+
+Both keys are fetched with a single get_many() call, so a cached read is one
+round trip to the cache.
+
+The token is replaced as soon as an item is saved, which may be before its
+transaction commits, so a concurrent read could cache the old items under
+the new token. The admin replaces the token again once its transaction has
+committed; do the same in your own code with invalidate_after_commit().
+
+Areas rendered with options (only some types, only the first few items, or
+another template namespace; see ContentArea.get_rendered_content) are stored
+under their own content keys, but share the area's version token, so one
+change invalidates every variation.
+
+Enable it in your settings:
+    FLEXIBLE_CONTENT = {
+        'CACHE_RENDERED_AREAS': True,
+        'CACHE_BACKEND': 'default',  # Optional: which of your CACHES to use.
+        'CACHE_TIMEOUT': 60 * 60,    # Optional: defaults to the backend's.
+    }
+
+ITEMS
+Each item's rendered fragment can be cached too, keyed on its content type,
+primary key, modification time and type slug. Since any change to an item
+updates its modification time, there's nothing to invalidate: the old
+fragment just stops being asked for. When an area is rendered, all of its
+fragments are fetched in a single get_many() call, and only the misses are
+rendered.
+
+Enable it with FLEXIBLE_CONTENT['CACHE_RENDERED_ITEMS'] = True. Hits and
+misses are counted per process; see get_fragment_cache_stats().
+"""
+
+import hashlib
+import threading
+import uuid
+from functools import wraps
+
+from django.core.cache import get_cache
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from .utils import get_app_settings
+
+
+AREA_VERSION_KEY_TEMPLATE = 'flexible-content:area-version:{ct}:{pk}'
+AREA_CONTENT_KEY_TEMPLATE = 'flexible-content:area:{ct}:{pk}'
+ITEM_CONTENT_KEY_TEMPLATE = ('flexible-content:item:{ct}:{pk}:{modified}:'
+                             '{slug}')
+
+# The areas invalidated inside invalidate_after_commit(), and whatever else
+# is waiting for it to finish (see run_after_commit), per thread.
+_pending_invalidations = threading.local()
+
+# Cache backend instances, by alias. Django creates a new instance (and, for
+# memcached, a new client) every time get_cache() is called, so hold on to
+# them.
+_backends = {}
+
+
+@receiver(setting_changed)
+def reset_cache_backends(sender, setting, **kwargs):
+    if setting in ('CACHES', 'FLEXIBLE_CONTENT'):
+        _backends.clear()
+
+
+def get_cache_backend():
+    """
+    Return the cache backend that flexible content should use.
+    """
+    alias = get_app_settings().get('CACHE_BACKEND', 'default')
+    if alias not in _backends:
+        _backends[alias] = get_cache(alias)
+    return _backends[alias]
+
+
+class FragmentCacheStats(object):
+    """
+    Count fragment cache hits and misses for this process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def count(self, hits=0, misses=0):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': float(self.hits) / total if total else None,
+        }
+
+
+fragment_cache_stats = FragmentCacheStats()
+
+
+def get_fragment_cache_stats():
+    """
+    Return this process's fragment cache hits, misses, and hit ratio.
+    """
+    return fragment_cache_stats.as_dict()
+
+
+def get_cache_timeout():
+    return get_app_settings().get('CACHE_TIMEOUT', None)
+
+
+def area_cache_enabled():
+    return bool(get_app_settings().get('CACHE_RENDERED_AREAS', False))
+
+
+def get_area_variant(types=None, limit=None, namespace=None):
+    """
+    Name the variation of an area's content that the given options render
+    (see ContentArea.get_rendered_content), for use in its cache key. The
+    full content is None.
+    """
+    if not types and limit is None and not namespace:
+        return None
+    return hashlib.md5(repr((sorted(types or ()), limit, namespace)).
+                       encode('utf-8')).hexdigest()
+
+
+def get_area_keys(area_ct_id, area_id, variant=None):
+    """
+    Return the version key and the content key for the given area. Every
+    variant of an area's content shares its version, so bumping it
+    invalidates them all.
+    """
+    key_data = {'ct': area_ct_id, 'pk': area_id}
+    content_key = AREA_CONTENT_KEY_TEMPLATE.format(**key_data)
+    if variant is not None:
+        content_key = '{}:{}'.format(content_key, variant)
+    return AREA_VERSION_KEY_TEMPLATE.format(**key_data), content_key
+
+
+def get_cached_area_content(area, variant=None):
+    """
+    Look up an area's rendered content in the cache.
+
+    Return a tuple of (content, version). If there's no valid content in the
+    cache, content will be None, and the version should be handed to
+    set_cached_area_content once the area has been rendered.
+    """
+    return get_cached_areas_content([area], variant)[0]
+
+
+def get_cached_areas_content(areas, variant=None):
+    """
+    Like get_cached_area_content, but for several areas at once, with a
+    single get_many(). Returns a list of (content, version) tuples, in the
+    same order as the areas.
+    """
+    cache = get_cache_backend()
+    keys = [get_area_keys(a.get_content_type().pk, a.pk, variant)
+            for a in areas]
+    found = cache.get_many([k for pair in keys for k in pair])
+
+    results = []
+    for version_key, content_key in keys:
+        version = found.get(version_key)
+        if version is None:
+            version = add_area_version(version_key)
+
+        # Only trust the content if it was rendered for the current version.
+        cached = found.get(content_key)
+        if cached is not None and cached[0] == version:
+            results.append((cached[1], version))
+        else:
+            results.append((None, version))
+    return results
+
+
+def add_area_version(version_key):
+    """
+    Give an area that has never been versioned (or whose version was
+    evicted) a fresh version, and return it. This uses add(), so it doesn't
+    clobber a concurrent bump; if there was one, that version's returned.
+    """
+    cache = get_cache_backend()
+    version = uuid.uuid4().hex
+    if not cache.add(version_key, version, get_cache_timeout()):
+        version = cache.get(version_key, version)
+    return version
+
+
+def get_area_cache_version(area_ct_id, area_id):
+    """
+    Return an area's current version, or None if the area cache is off.
+    Since it's replaced whenever the area changes, it can go in anything
+    that should change along with the area, like an ETag.
+    """
+    if not area_cache_enabled():
+        return None
+    version_key, content_key = get_area_keys(area_ct_id, area_id)
+    version = get_cache_backend().get(version_key)
+    if version is None:
+        version = add_area_version(version_key)
+    return version
+
+
+def set_cached_area_content(area, content, version, variant=None,
+                            timeout=None):
+    """
+    Store an area's rendered content, tagged with the version it was rendered
+    for. The timeout defaults to FLEXIBLE_CONTENT['CACHE_TIMEOUT'].
+    """
+    cache = get_cache_backend()
+    version_key, content_key = get_area_keys(area.get_content_type().pk,
+                                             area.pk, variant)
+    if timeout is None:
+        timeout = get_cache_timeout()
+    cache.set(content_key, (version, content), timeout)
+
+
+def invalidate_area(area_ct_id, area_id):
+    """
+    Bump an area's version, so any content cached for it is ignored. Inside
+    invalidate_after_commit(), it's bumped again at the end of the block.
+    """
+    if not area_cache_enabled():
+        return
+    bump_area_version(area_ct_id, area_id)
+    pending = getattr(_pending_invalidations, 'areas', None)
+    if pending is not None:
+        pending.add((area_ct_id, area_id))
+
+
+def bump_area_version(area_ct_id, area_id):
+    version_key, content_key = get_area_keys(area_ct_id, area_id)
+    get_cache_backend().set(version_key, uuid.uuid4().hex,
+                            get_cache_timeout())
+
+
+class invalidate_after_commit(object):
+    """
+    Invalidate the areas that change inside this block again once it's
+    over, for code whose transaction commits by the end of it:
+        with invalidate_after_commit():
+            with transaction.commit_on_success():
+                item.save()
+
+    The first invalidation happens before the commit, so a concurrent read
+    can still see the old items, render them, and cache them under the new
+    version. The second one throws that away. (Django versions with
+    transaction.on_commit() could wait for the commit instead; 1.5 has
+    nothing like it.) Nested blocks leave it to the outermost one. It can
+    also decorate a function, as the admin's views are.
+
+    Anything queued with run_after_commit() inside the block is run at the
+    end of it too, just before the second invalidation.
+    """
+
+    def __enter__(self):
+        self.outermost = getattr(_pending_invalidations, 'areas',
+                                 None) is None
+        if self.outermost:
+            _pending_invalidations.areas = set()
+            _pending_invalidations.callbacks = {}
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.outermost:
+            return
+        areas = _pending_invalidations.areas
+        callbacks = _pending_invalidations.callbacks
+        _pending_invalidations.areas = None
+        _pending_invalidations.callbacks = None
+        for key in sorted(callbacks):
+            callbacks[key]()
+        for area_ct_id, area_id in sorted(areas):
+            bump_area_version(area_ct_id, area_id)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with invalidate_after_commit():
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def run_after_commit(key, callback):
+    """
+    Inside invalidate_after_commit(), call callback() once the outermost
+    block is over, and return True. However many times the same key is
+    queued, the callback only runs once. Outside of a block, return False,
+    and leave it to the caller.
+    """
+    callbacks = getattr(_pending_invalidations, 'callbacks', None)
+    if callbacks is None:
+        return False
+    callbacks.setdefault(key, callback)
+    return True
+
+
+def item_cache_enabled():
+    return bool(get_app_settings().get('CACHE_RENDERED_ITEMS', False))
+
+
+def get_item_key(item, namespace=None):
+    """
+    Return the key an item's rendered fragment is stored under.
+    """
+    slug = item.get_type_slug()
+    if namespace:
+        slug = '{}/{}'.format(namespace, slug)
+    return ITEM_CONTENT_KEY_TEMPLATE.format(
+        ct=item.get_content_type().pk,
+        pk=item.pk,
+        modified=item.modified.strftime('%Y%m%d%H%M%S%f'),
+        slug=slug)
+
+
+def can_cache_item(item):
+    # Unsaved items don't have a stable key.
+    return (item_cache_enabled() and item.pk is not None and
+            item.modified is not None)
+
+
+def get_cached_item_content(item):
+    """
+    Look up an item's rendered fragment, or return None if it isn't cached.
+    """
+    if not can_cache_item(item):
+        return None
+    content = get_cache_backend().get(get_item_key(item))
+    if content is None:
+        fragment_cache_stats.count(misses=1)
+    else:
+        fragment_cache_stats.count(hits=1)
+    return content
+
+
+def set_cached_item_content(item, content):
+    if can_cache_item(item):
+        get_cache_backend().set(get_item_key(item), content,
+                                get_cache_timeout())
+
+
+def render_items(items, namespace=None):
+    """
+    Render each of the given items, fetching as many of them from the cache
+    as possible in one round trip. Return a list of fragments, in order.
+
+    With a template namespace (see rendering.get_template_names), the
+    fragments are cached separately, and not kept on the items.
+    """
+    items = list(items)
+    if not item_cache_enabled():
+        if namespace is None:
+            return [i.get_rendered_content() for i in items]
+        return [i.render_content(namespace) for i in items]
+
+    # Only look up the items that haven't already been rendered.
+    keys = {}
+    for i in items:
+        if (namespace is None and
+                getattr(i, '_rendered_content', None) is not None):
+            continue
+        if can_cache_item(i):
+            keys[get_item_key(i, namespace)] = i
+    found = get_cache_backend().get_many(list(keys))
+
+    # Render whatever the cache didn't have, and store it for next time.
+    fragments = {}
+    new_fragments = {}
+    for key, item in keys.items():
+        if key in found:
+            fragments[key] = found[key]
+        else:
+            fragments[key] = new_fragments[key] = item.render_content(
+                namespace)
+    if new_fragments:
+        get_cache_backend().set_many(new_fragments, get_cache_timeout())
+    fragment_cache_stats.count(hits=len(found), misses=len(new_fragments))
+
+    if namespace is None:
+        for key, item in keys.items():
+            item._rendered_content = fragments[key]
+        return [i.get_rendered_content() for i in items]
+
+    rendered = []
+    for i in items:
+        if can_cache_item(i):
+            rendered.append(fragments[get_item_key(i, namespace)])
+        else:
+            rendered.append(i.render_content(namespace))
+    return rendered
@@ -1,56 +1,79 @@
 from django import forms
 from django.utils.translation import ugettext as _
-from django.utils import simplejson
 
-import requests
 from flexible_content.forms import BaseItemForm
 
 from .models import Video
+from .video_validators import get_video_validator
 
 
 class VideoForm(BaseItemForm):
     class Meta(BaseItemForm.Meta):
         model = Video
 
+    @classmethod
+    def prevalidate(cls, forms):
+        """
+        Check all of the submitted video IDs at once, rather than one at a
+        time as each form is cleaned.
+        """
+        videos = {}
+        for f in forms:
+            video = f.get_submitted_video()
+            if video is not None:
+                videos[f] = video
+        if not videos:
+            return
+
+        answers = get_video_validator().validate_many(videos.values())
+        for f, video in videos.items():
+            f.prevalidated_videos = {video: answers[video]}
+
+    def get_submitted_video(self):
+        """
+        Return the (service, video_id) that was submitted, or None if the
+        form isn't bound.
+        """
+        if not self.is_bound:
+            return None
+        service = self['service'].data or ''
+        video_id = (self['video_id'].data or '').strip()
+        return service, video_id
+
+    def save(self, *args, **kwargs):
+        """
+        A different video needs its metadata fetched again.
+        """
+        if self.instance.pk and ('service' in self.changed_data or
+                                 'video_id' in self.changed_data):
+            self.instance.clear_metadata()
+        return super(VideoForm, self).save(*args, **kwargs)
+
     def clean_video_id(self):
         """
         Ensure that, for the given service, the video_id is valid.
         """
-        failed = False
         d = self.cleaned_data
         service = d.get('service')
         # Get the video id and clear whitespace on either side.
         video_id = d.get('video_id', '').strip()
 
-        # Validate using YouTube's API:
-        if service == 'youtube':
-            url = ('http://gdata.youtube.com/feeds/api/videos/{}?alt=json'.
-                   format(video_id))
-            data = requests.get(url)
-            # Ensure we can parse the JSON data.
-            try:
-                json = simplejson.loads(data.text)
-            # If not, mark this as a failure.
-            except ValueError:
-                failed = True
-
-        # Validate using Vimeo's API:
-        elif service == 'vimeo':
-            data = requests.get('http://vimeo.com/api/v2/video/{}.json'.
-                                format(video_id))
-            # Ensure we can parse the JSON data.
-            try:
-                json = simplejson.loads(data.text)
-            # If not, mark this as a failure.
-            except ValueError:
-                failed = True
+        # Use the answer from prevalidate(), if there is one.
+        prevalidated = getattr(self, 'prevalidated_videos', {})
+        if (service, video_id) in prevalidated:
+            valid = prevalidated[(service, video_id)]
+        else:
+            valid = get_video_validator().validate(service, video_id)
 
         # Respond based on the outcome.
-        if failed:
+        if valid is None:
+            message = _("Couldn't reach the {} API to validate the video "
+                        "id. Please try again in a moment.".format(service))
+            raise forms.ValidationError(message)
+        elif not valid:
             message = _("Couldn't validate video id using {} API. Please "
                         "verify it exists and check for "
                         "typos.".format(service))
             raise forms.ValidationError(message)
 
         return video_id
-
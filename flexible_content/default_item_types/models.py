@@ -1,4 +1,7 @@
+from __future__ import division
+
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from flexible_content.models import BaseItem
@@ -25,6 +28,7 @@ class RawHTML(BaseItem):
     class FlexibleContentInfo:
         description = _("Insert custom scripts or snippets of HTML here. Be "
                         "careful, though: you *can* break the site this way.")
+        type_slug = 'raw-html'
 
     class Meta:
         verbose_name = _("Raw HTML")
@@ -76,6 +80,23 @@ class Video(BaseItem):
     video_id = models.CharField(verbose_name=_("Video ID"), max_length=100,
                                 help_text=HELP_VIDEO_ID)
 
+    # Metadata from the video's service. It's filled in by
+    # fc_refresh_video_metadata (see video_metadata.py), so that rendering a
+    # video never has to ask the service for anything.
+    title = models.CharField(max_length=255, blank=True, editable=False)
+    thumbnail_url = models.URLField(max_length=500, blank=True,
+                                    editable=False)
+    duration = models.PositiveIntegerField(null=True, blank=True,
+                                           editable=False,
+                                           help_text=_("In seconds."))
+    aspect_ratio = models.FloatField(null=True, blank=True, editable=False)
+    metadata_updated = models.DateTimeField(null=True, blank=True,
+                                            editable=False)
+
+    METADATA_FIELDS = ('title', 'thumbnail_url', 'duration', 'aspect_ratio')
+    DEFAULT_WIDTH = 640
+    DEFAULT_HEIGHT = 365
+
     class FlexibleContentInfo:
         description = _("Give details about a video and have it displayed as "
                         "the site chooses. You can also specify a heading or "
@@ -89,6 +110,37 @@ class Video(BaseItem):
         from .forms import VideoForm
         return VideoForm
 
+    def get_embed_height(self, width=None):
+        """
+        How tall the embedded player should be at the given width (by
+        default, DEFAULT_WIDTH): the right height for the video's aspect
+        ratio, or DEFAULT_HEIGHT if that isn't known yet.
+        """
+        if not self.aspect_ratio:
+            return self.DEFAULT_HEIGHT
+        width = width or self.DEFAULT_WIDTH
+        return int(round(width / self.aspect_ratio))
+
+    def clear_metadata(self):
+        """
+        Forget this video's metadata (without saving), so it's fetched again.
+        """
+        self.title = self.thumbnail_url = ''
+        self.duration = self.aspect_ratio = self.metadata_updated = None
+
+    def set_metadata(self, metadata):
+        """
+        Store metadata from a fetcher. Only the metadata (and the
+        modification time, so cached fragments are re-rendered) is written.
+        """
+        self.title = (metadata.get('title') or '')[:255]
+        self.thumbnail_url = metadata.get('thumbnail_url') or ''
+        self.duration = metadata.get('duration')
+        self.aspect_ratio = metadata.get('aspect_ratio')
+        self.metadata_updated = timezone.now()
+        self.save(update_fields=self.METADATA_FIELDS +
+                  ('metadata_updated', 'modified'))
+
 
 # Register all of the types below
 DEFAULT_TYPES = (PlainText, RawHTML, Image, Download, Video)
@@ -1,8 +1,74 @@
+import threading
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
 
 from mock_project.test_app.models import MyArea
 
+from .forms import VideoForm
 from .models import Video
+from .video_metadata import (BaseVideoMetadataFetcher,
+                             get_video_metadata_fetcher,
+                             refresh_video_metadata)
+from .video_validators import (BaseVideoValidator, HTTPVideoValidator,
+                               LocalVideoValidator, get_video_validator)
+
+
+VALIDATORS_MODULE = 'flexible_content.default_item_types.tests'
+
+
+class RecordingValidator(BaseVideoValidator):
+    """
+    Accepts every video, and keeps track of how it was asked.
+    """
+    concurrent = True
+    batches = []
+
+    def check(self, service, video_id):
+        return True
+
+    def validate_many(self, videos):
+        videos = list(videos)
+        self.batches.append(videos)
+        return super(RecordingValidator, self).validate_many(videos)
+
+
+class CountingHTTPValidator(HTTPVideoValidator):
+    """
+    Pretends to ask the service, without using the network.
+    """
+    def __init__(self):
+        super(CountingHTTPValidator, self).__init__()
+        self.checks = 0
+        self.threads = set()
+
+    def check(self, service, video_id):
+        self.checks += 1
+        self.threads.add(threading.current_thread().ident)
+        return video_id != 'missing'
+
+
+class FakeMetadataFetcher(BaseVideoMetadataFetcher):
+    """
+    Knows about a few made-up videos, and counts how often it's asked.
+    """
+    concurrent = True
+    fetched = []
+
+    def fetch(self, service, video_id):
+        self.fetched.append((service, video_id))
+        if video_id == 'missing':
+            return None
+        return {
+            'title': u"Video <{}>".format(video_id),
+            'thumbnail_url': 'http://example.com/{}.jpg'.format(video_id),
+            'duration': 90,
+            'aspect_ratio': 4.0 / 3,
+        }
 
 
 class VideoTest(TestCase):
@@ -102,3 +168,148 @@ class VideoTest(TestCase):
         else:
             self.fail("Form allowed an invalid Vimeo ID.")
 
+
+
+@override_settings(FLEXIBLE_CONTENT={
+    'VIDEO_VALIDATOR': ('flexible_content.default_item_types.'
+                        'video_validators.LocalVideoValidator'),
+})
+class VideoValidatorTest(TestCase):
+    """
+    Check the validators themselves, without the network.
+    """
+
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Blah")
+
+    def get_form(self, video_id, service='vimeo', prefix=None):
+        data = {
+            'content_area_id': self.area.pk,
+            'content_area_ct': self.area.get_content_type().pk,
+            'ordering': 1,
+            'service': service,
+            'video_id': video_id,
+        }
+        if prefix is not None:
+            data = dict(('{}-{}'.format(prefix, k), v)
+                        for k, v in data.items())
+        return Video().get_form(data, prefix=prefix)
+
+    def test_local_validator(self):
+        self.assertIsInstance(get_video_validator(), LocalVideoValidator)
+        self.assertTrue(self.get_form("59338758").is_valid())
+        self.assertTrue(self.get_form("RnAAIHBCubM", 'youtube').is_valid())
+        self.assertFalse(self.get_form("a1b2c3d4").is_valid())
+        self.assertFalse(self.get_form("abc123", 'youtube').is_valid())
+
+    def test_bad_validator_setting(self):
+        with self.settings(FLEXIBLE_CONTENT={'VIDEO_VALIDATOR': 'nope.Nope'}):
+            self.assertRaises(ImproperlyConfigured, get_video_validator)
+
+    def test_prevalidate(self):
+        """
+        All of a submission's videos should be checked in one go.
+        """
+        path = VALIDATORS_MODULE + '.RecordingValidator'
+        with self.settings(FLEXIBLE_CONTENT={'VIDEO_VALIDATOR': path}):
+            RecordingValidator.batches = []
+            forms = [self.get_form(str(n), prefix='fc-item-{}'.format(n))
+                     for n in range(1, 4)]
+            VideoForm.prevalidate(forms)
+            self.assertEqual(len(RecordingValidator.batches), 1)
+            self.assertEqual(sorted(RecordingValidator.batches[0]),
+                             [('vimeo', '1'), ('vimeo', '2'), ('vimeo', '3')])
+
+            # Cleaning the forms shouldn't ask again.
+            self.assertTrue(all(f.is_valid() for f in forms))
+            self.assertEqual(len(RecordingValidator.batches), 1)
+
+    def test_http_validator_caches(self):
+        validator = CountingHTTPValidator()
+        self.assertTrue(validator.validate('vimeo', '59338758'))
+        self.assertTrue(validator.validate('vimeo', '59338758'))
+        self.assertFalse(validator.validate('vimeo', 'missing'))
+        self.assertFalse(validator.validate('vimeo', 'missing'))
+        self.assertEqual(validator.checks, 2)
+
+    def test_http_validator_concurrent(self):
+        validator = CountingHTTPValidator()
+        videos = [('vimeo', 'concurrent-{}'.format(n)) for n in range(8)]
+        answers = validator.validate_many(videos)
+        self.assertEqual(answers, dict((v, True) for v in videos))
+        self.assertNotIn(threading.current_thread().ident, validator.threads)
+
+
+@override_settings(FLEXIBLE_CONTENT={
+    'VIDEO_METADATA_FETCHER': VALIDATORS_MODULE + '.FakeMetadataFetcher',
+    'VIDEO_VALIDATOR': ('flexible_content.default_item_types.'
+                        'video_validators.LocalVideoValidator'),
+})
+class VideoMetadataTest(TestCase):
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Blah")
+        self.videos = [self.create_video(str(n)) for n in range(1, 4)]
+        FakeMetadataFetcher.fetched = []
+
+    def create_video(self, video_id):
+        return Video.objects.create(
+            content_area_ct=self.area.get_content_type(),
+            content_area_id=self.area.pk, ordering=1, service='vimeo',
+            video_id=video_id)
+
+    def test_refresh(self):
+        missing = self.create_video('missing')
+        self.assertEqual(refresh_video_metadata(batch_size=2), (3, 1))
+        video = Video.objects.get(pk=self.videos[0].pk)
+        self.assertEqual(video.title, u"Video <1>")
+        self.assertEqual(video.thumbnail_url, 'http://example.com/1.jpg')
+        self.assertEqual(video.duration, 90)
+        self.assertIsNotNone(video.metadata_updated)
+        self.assertGreater(video.modified, self.videos[0].modified)
+        self.assertIsNone(Video.objects.get(pk=missing.pk).metadata_updated)
+
+        # Only the video that failed is tried again, unless we ask for more.
+        FakeMetadataFetcher.fetched = []
+        self.assertEqual(refresh_video_metadata(), (0, 1))
+        self.assertEqual(FakeMetadataFetcher.fetched, [('vimeo', 'missing')])
+        self.assertEqual(refresh_video_metadata(max_age=timedelta(0)),
+                         (3, 1))
+
+    def test_render_without_fetching(self):
+        refresh_video_metadata()
+        FakeMetadataFetcher.fetched = []
+        video = Video.objects.get(pk=self.videos[0].pk)
+        content = video.get_rendered_content()
+        self.assertEqual(FakeMetadataFetcher.fetched, [])
+        self.assertIn('title="Video &lt;1&gt;"', content)
+        self.assertIn('content="http://example.com/1.jpg"', content)
+        self.assertIn('content="PT90S"', content)
+        self.assertIn('width="640" height="480"',
+                      ' '.join(content.split()))
+        self.assertEqual(video.get_embed_height(320), 240)
+
+    def test_changed_video_clears_metadata(self):
+        refresh_video_metadata()
+        video = Video.objects.get(pk=self.videos[0].pk)
+        data = {
+            'content_area_id': self.area.pk,
+            'content_area_ct': self.area.get_content_type().pk,
+            'ordering': 1,
+            'service': 'vimeo',
+            'video_id': '59338758',
+        }
+        form = video.get_form(data)
+        self.assertTrue(form.is_valid())
+        form.save()
+        video = Video.objects.get(pk=video.pk)
+        self.assertEqual(video.title, '')
+        self.assertIsNone(video.metadata_updated)
+        self.assertEqual(video.get_embed_height(), Video.DEFAULT_HEIGHT)
+
+    def test_command(self):
+        self.assertIsInstance(get_video_metadata_fetcher(),
+                              FakeMetadataFetcher)
+        out = StringIO()
+        call_command('fc_refresh_video_metadata', stdout=out)
+        self.assertIn("Refreshed metadata for 3 video(s)", out.getvalue())
+        self.assertEqual(Video.objects.filter(title='').count(), 0)
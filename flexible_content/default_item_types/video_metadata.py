@@ -0,0 +1,206 @@
+"""
+Fetch each video's title, thumbnail, duration and aspect ratio, and store
+them on the Video, so rendering a video never has to ask its service.
+
+Metadata is fetched by a background job rather than while anyone waits:
+    python manage.py fc_refresh_video_metadata
+
+The fetcher is chosen in your settings:
+    FLEXIBLE_CONTENT = {
+        # The default, which asks YouTube and Vimeo:
+        'VIDEO_METADATA_FETCHER': ('flexible_content.default_item_types.'
+                                   'video_metadata.HTTPVideoMetadataFetcher'),
+        # Or, to skip the network (for tests or offline work), make up
+        # placeholder metadata:
+        'VIDEO_METADATA_FETCHER': ('flexible_content.default_item_types.'
+                                   'video_metadata.LocalVideoMetadataFetcher'),
+    }
+
+Like the validators, the HTTP fetcher gives up after VIDEO_VALIDATION_TIMEOUT
+seconds and asks about several videos at once, on up to
+VIDEO_VALIDATION_THREADS threads.
+
+To write your own, subclass BaseVideoMetadataFetcher and implement fetch().
+"""
+
+from __future__ import division
+
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.db.models import Q
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils import timezone
+
+from flexible_content.utils import (get_app_settings, get_object_from_string,
+                                    iter_pk_batches, threaded_map)
+
+
+DEFAULT_FETCHER = ('flexible_content.default_item_types.video_metadata.'
+                   'HTTPVideoMetadataFetcher')
+REFRESH_BATCH_SIZE = 50
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_video_metadata_fetcher(sender, setting, **kwargs):
+    global _fetcher
+    if setting == 'FLEXIBLE_CONTENT':
+        with _fetcher_lock:
+            _fetcher = None
+
+
+def get_video_metadata_fetcher():
+    """
+    Return the configured fetcher. It's created once and shared, so it can
+    hold on to its connections.
+    """
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                path = get_app_settings().get('VIDEO_METADATA_FETCHER',
+                                              DEFAULT_FETCHER)
+                fetcher_class = get_object_from_string(
+                    path, 'VIDEO_METADATA_FETCHER')
+                _fetcher = fetcher_class()
+    return _fetcher
+
+
+class BaseVideoMetadataFetcher(object):
+    """
+    Looks up videos' metadata. fetch() returns a dictionary with any of the
+    keys 'title', 'thumbnail_url', 'duration' (in seconds) and
+    'aspect_ratio' (width / height), or None if it couldn't find out.
+    """
+
+    # Can fetch() be called from several threads at once?
+    concurrent = False
+
+    def fetch(self, service, video_id):
+        raise NotImplementedError
+
+    def fetch_many(self, videos):
+        """
+        Fetch metadata for several (service, video_id) pairs, concurrently if
+        this fetcher allows it. Returns a dictionary of answers, by pair.
+        """
+        videos = list(set(videos))
+        threads = get_app_settings().get('VIDEO_VALIDATION_THREADS', 8)
+        if not self.concurrent:
+            threads = 1
+        answers = threaded_map(lambda v: self.fetch(*v), videos, threads)
+        return dict(zip(videos, answers))
+
+
+class LocalVideoMetadataFetcher(BaseVideoMetadataFetcher):
+    """
+    Make up metadata without asking the service. Handy for tests and working
+    offline.
+    """
+
+    def fetch(self, service, video_id):
+        return {
+            'title': u"{} video {}".format(service, video_id),
+            'thumbnail_url': '',
+            'duration': None,
+            'aspect_ratio': 16 / 9,
+        }
+
+
+class HTTPVideoMetadataFetcher(BaseVideoMetadataFetcher):
+    """
+    Ask each video's service for its metadata: Vimeo's simple API, and
+    YouTube's oEmbed endpoint (which doesn't say how long a video is).
+    """
+
+    concurrent = True
+    urls = {
+        'youtube': ('http://www.youtube.com/oembed?format=json&url='
+                    'http%3A//www.youtube.com/watch%3Fv%3D{video_id}'),
+        'vimeo': 'http://vimeo.com/api/v2/video/{video_id}.json',
+    }
+
+    def __init__(self):
+        threads = get_app_settings().get('VIDEO_VALIDATION_THREADS', 8)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_timeout(self):
+        return get_app_settings().get('VIDEO_VALIDATION_TIMEOUT', 5)
+
+    def fetch(self, service, video_id):
+        url = self.urls.get(service)
+        if url is None:
+            return None
+        try:
+            response = self.session.get(url.format(video_id=video_id),
+                                        timeout=self.get_timeout())
+            data = json.loads(response.text)
+        except (requests.RequestException, ValueError):
+            return None
+
+        # Vimeo sends a list with one video in it.
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        if not isinstance(data, dict):
+            return None
+
+        width, height = data.get('width'), data.get('height')
+        try:
+            aspect_ratio = int(width) / int(height)
+        except (TypeError, ValueError, ZeroDivisionError):
+            aspect_ratio = None
+        try:
+            duration = int(data['duration'])
+        except (KeyError, TypeError, ValueError):
+            duration = None
+
+        return {
+            'title': data.get('title') or '',
+            'thumbnail_url': (data.get('thumbnail_url') or
+                              data.get('thumbnail_large') or ''),
+            'duration': duration,
+            'aspect_ratio': aspect_ratio,
+        }
+
+
+def refresh_video_metadata(queryset=None, max_age=None, batch_size=None):
+    """
+    Fetch and store metadata for videos that don't have any yet, or (given a
+    timedelta `max_age`) whose metadata is older than that. Works through
+    `batch_size` videos at a time, fetching each batch's metadata at once.
+
+    Returns a tuple of (refreshed, failed) counts. Videos that couldn't be
+    fetched are left alone, to be tried again next time.
+    """
+    from .models import Video
+
+    if queryset is None:
+        queryset = Video.objects.all()
+    stale = Q(metadata_updated__isnull=True)
+    if max_age is not None:
+        stale |= Q(metadata_updated__lt=timezone.now() - max_age)
+    stale = queryset.filter(stale)
+    batch_size = batch_size or REFRESH_BATCH_SIZE
+    fetcher = get_video_metadata_fetcher()
+
+    refreshed = failed = 0
+    for pks in iter_pk_batches(stale, batch_size):
+        videos = list(Video.objects.filter(pk__in=pks))
+        answers = fetcher.fetch_many((v.service, v.video_id) for v in videos)
+        for video in videos:
+            metadata = answers.get((video.service, video.video_id))
+            if metadata is None:
+                failed += 1
+                continue
+            video.set_metadata(metadata)
+            refreshed += 1
+    return refreshed, failed
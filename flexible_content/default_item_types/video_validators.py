@@ -0,0 +1,177 @@
+"""
+Check that a video ID actually exists on its service.
+
+VideoForm asks the configured validator, which you can choose in your
+settings:
+    FLEXIBLE_CONTENT = {
+        # The default, which asks YouTube and Vimeo:
+        'VIDEO_VALIDATOR': ('flexible_content.default_item_types.'
+                            'video_validators.HTTPVideoValidator'),
+        # Or, to skip the network (for tests or offline work), only check
+        # that the ID looks right:
+        'VIDEO_VALIDATOR': ('flexible_content.default_item_types.'
+                            'video_validators.LocalVideoValidator'),
+    }
+
+The HTTP validator reuses its connections, gives up after
+VIDEO_VALIDATION_TIMEOUT seconds (5 by default), and caches each answer in
+flexible content's cache backend for VIDEO_VALIDATION_CACHE_TIMEOUT seconds
+(a day by default). When several videos are submitted at once, they're
+checked at the same time, on up to VIDEO_VALIDATION_THREADS threads (8 by
+default).
+
+To write your own, subclass BaseVideoValidator and implement check().
+"""
+
+import hashlib
+import json
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from flexible_content.cache import get_cache_backend
+from flexible_content.utils import (get_app_settings, get_object_from_string,
+                                    threaded_map)
+
+
+DEFAULT_VALIDATOR = ('flexible_content.default_item_types.video_validators.'
+                     'HTTPVideoValidator')
+RESULT_KEY_TEMPLATE = 'flexible-content:video-valid:{service}:{video_id}'
+
+_validator = None
+_validator_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_video_validator(sender, setting, **kwargs):
+    global _validator
+    if setting == 'FLEXIBLE_CONTENT':
+        with _validator_lock:
+            _validator = None
+
+
+def get_video_validator():
+    """
+    Return the configured validator. It's created once and shared, so it can
+    hold on to its connections.
+    """
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                path = get_app_settings().get('VIDEO_VALIDATOR',
+                                              DEFAULT_VALIDATOR)
+                validator_class = get_object_from_string(path,
+                                                         'VIDEO_VALIDATOR')
+                _validator = validator_class()
+    return _validator
+
+
+class BaseVideoValidator(object):
+    """
+    Decides whether video IDs exist. Each answer is True (it does), False
+    (it doesn't), or None (we couldn't find out).
+    """
+
+    # Can check() be called from several threads at once?
+    concurrent = False
+
+    def check(self, service, video_id):
+        raise NotImplementedError
+
+    def validate(self, service, video_id):
+        return self.check(service, video_id)
+
+    def validate_many(self, videos):
+        """
+        Validate several (service, video_id) pairs, concurrently if this
+        validator allows it. Returns a dictionary of answers, by pair.
+        """
+        videos = list(set(videos))
+        threads = get_app_settings().get('VIDEO_VALIDATION_THREADS', 8)
+        if not self.concurrent:
+            threads = 1
+        answers = threaded_map(lambda v: self.validate(*v), videos, threads)
+        return dict(zip(videos, answers))
+
+
+class LocalVideoValidator(BaseVideoValidator):
+    """
+    Only check that video IDs look right for their service, without asking
+    the service. Handy for tests and working offline.
+    """
+
+    patterns = {
+        'youtube': re.compile(r'^[\w-]{11}$'),
+        'vimeo': re.compile(r'^\d+$'),
+    }
+
+    def check(self, service, video_id):
+        pattern = self.patterns.get(service)
+        if pattern is None:
+            return False
+        return bool(pattern.match(video_id))
+
+
+class HTTPVideoValidator(BaseVideoValidator):
+    """
+    Ask each video's service whether it exists, caching the answers.
+    """
+
+    concurrent = True
+    urls = {
+        'youtube': ('http://gdata.youtube.com/feeds/api/videos/{video_id}'
+                    '?alt=json'),
+        'vimeo': 'http://vimeo.com/api/v2/video/{video_id}.json',
+    }
+
+    def __init__(self):
+        # Keep connections open between lookups, with enough of them for
+        # every thread.
+        threads = get_app_settings().get('VIDEO_VALIDATION_THREADS', 8)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_timeout(self):
+        return get_app_settings().get('VIDEO_VALIDATION_TIMEOUT', 5)
+
+    def get_cache_timeout(self):
+        return get_app_settings().get('VIDEO_VALIDATION_CACHE_TIMEOUT',
+                                      24 * 60 * 60)
+
+    def validate(self, service, video_id):
+        # IDs are typed in by people, so hash them to get a safe cache key.
+        key = RESULT_KEY_TEMPLATE.format(
+            service=service,
+            video_id=hashlib.md5(video_id.encode('utf-8')).hexdigest())
+        cache = get_cache_backend()
+        valid = cache.get(key)
+        if valid is None:
+            valid = self.check(service, video_id)
+            # Don't remember that the service couldn't be reached.
+            if valid is not None:
+                cache.set(key, valid, self.get_cache_timeout())
+        return valid
+
+    def check(self, service, video_id):
+        url = self.urls.get(service)
+        if url is None:
+            return False
+        try:
+            response = self.session.get(url.format(video_id=video_id),
+                                        timeout=self.get_timeout())
+        except requests.RequestException:
+            return None
+
+        # The services only send back JSON for videos that exist.
+        try:
+            json.loads(response.text)
+        except ValueError:
+            return False
+        return True
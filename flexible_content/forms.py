@@ -1,5 +1,22 @@
+import hashlib
+import threading
+
 from django import forms
+from django.dispatch import receiver
 from django.template.loader import render_to_string
+from django.test.signals import setting_changed
+from django.utils.encoding import force_text
+
+
+# Form classes generated for item types that don't specify one, by model.
+_auto_form_classes = {}
+_auto_form_classes_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_auto_form_classes(sender, **kwargs):
+    with _auto_form_classes_lock:
+        _auto_form_classes.clear()
 
 
 class BaseItemForm(forms.ModelForm):
@@ -10,6 +27,16 @@ class BaseItemForm(forms.ModelForm):
     class Meta(object):
         pass
 
+    @classmethod
+    def prevalidate(cls, forms):
+        """
+        Given several bound forms of this class that are about to be
+        validated, do any slow checks for all of them at once. For instance,
+        VideoForm looks up all of the videos concurrently. By default, this
+        does nothing.
+        """
+        pass
+
     def already_exists(self):
         """
         Report on whether or not this instance has been saved.
@@ -23,6 +50,41 @@ class BaseItemForm(forms.ModelForm):
         """
         return render_to_string(self.content_item_template, {'form': self})
 
+    def get_changed_fields(self):
+        """
+        Which of the item's fields did the submitted data change? The delete
+        flag isn't a model field, so it doesn't count.
+        """
+        return [name for name in self.changed_data if name != 'delete']
+
+    def get_fingerprint(self):
+        """
+        Summarize the saved item this form is for: which item it is, when it
+        was last saved, and the data the form starts out with. This goes in
+        a hidden field, so we can tell whether the submitted form is the one
+        that was rendered.
+        """
+        if not self.already_exists():
+            return ''
+        modified = self.instance.modified
+        initial = [(name, force_text(self.initial.get(name)))
+                   for name in sorted(self.fields) if name != 'delete']
+        data = repr((self.instance.pk,
+                     modified.isoformat() if modified else None,
+                     initial))
+        return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+    def is_unchanged(self):
+        """
+        Was this form submitted just as it was rendered, for an item nobody
+        has saved since? If so, it doesn't need to be validated or saved.
+        """
+        if not self.already_exists():
+            return False
+        fingerprint = self.data.get('{}-fingerprint'.format(self.prefix))
+        return (fingerprint == self.get_fingerprint() and
+                not self.get_changed_fields())
+
     def get_unique_fields(self):
         """
         Which fields aren't part of BaseItem? These will be presented front
@@ -51,3 +113,23 @@ class BaseItemForm(forms.ModelForm):
         """
         return bool(int(self.data.get('{}-delete'.format(self.prefix), '0')))
 
+
+def get_auto_form_class(model):
+    """
+    Return a BaseItemForm subclass for the given item model, generating it
+    the first time it's asked for. Building a ModelForm class is expensive,
+    so every later call (from any thread) gets the same class.
+    """
+    form_class = _auto_form_classes.get(model)
+    if form_class is None:
+        with _auto_form_classes_lock:
+            # Another thread may have beaten us to it.
+            form_class = _auto_form_classes.get(model)
+            if form_class is None:
+                name = 'AutoGenerated{}Form'.format(model.__name__)
+                form_class_meta = type('Meta', (BaseItemForm.Meta,),
+                                       {'model': model})
+                form_class = type(name, (BaseItemForm,),
+                                  {'Meta': form_class_meta})
+                _auto_form_classes[model] = form_class
+    return form_class
@@ -0,0 +1,340 @@
+"""
+Time the busiest parts of flexible content, so you can see where it spends
+its time in production.
+
+Turn it on in your settings:
+    FLEXIBLE_CONTENT = {
+        'INSTRUMENTATION': True,
+        # Optional: where timings go. Defaults to an in-memory aggregator.
+        'INSTRUMENTATION_COLLECTOR': 'myproject.metrics.StatsdCollector',
+    }
+
+These operations are timed:
+    items.load        loading an area's items (BaseItemManager.get_for_area),
+                      counting only the time spent fetching them
+    item.render       rendering one item's template (by item type)
+    area.render       ContentArea.get_rendered_content, including where the
+                      content came from: 'cache', 'snapshot' or 'render'
+    admin.get_forms   ContentAreaAdmin.fc_get_forms
+    admin.save_items  ContentAreaAdmin.fc_save_items
+
+Each timing is handed to the collector, and sent with the timing_recorded
+signal, as a Timing: its duration in seconds, the number of queries it made
+(when queries are being recorded, e.g. with DEBUG on), and how many items of
+each type it involved. The default MemoryCollector keeps the most recent
+timings of each kind and reports percentiles:
+    from flexible_content.instrumentation import get_collector
+    get_collector().get_summary()
+
+When it's off, each instrumented call costs a function call or two.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal, receiver
+from django.test.signals import setting_changed
+
+from .utils import get_app_settings, get_object_from_string
+
+
+DEFAULT_COLLECTOR = 'flexible_content.instrumentation.MemoryCollector'
+
+# Sent with each Timing, after the collector has it.
+timing_recorded = Signal(providing_args=['timing'])
+
+# Whether instrumentation is on, and the collector. Worked out when first
+# needed, and again whenever the settings change.
+_enabled = None
+_collector = None
+_collector_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_instrumentation(sender, setting, **kwargs):
+    global _enabled, _collector
+    if setting in ('FLEXIBLE_CONTENT', 'DEBUG'):
+        with _collector_lock:
+            _enabled = None
+            _collector = None
+
+
+def instrumentation_enabled():
+    global _enabled
+    if _enabled is None:
+        _enabled = bool(get_app_settings().get('INSTRUMENTATION', False))
+    return _enabled
+
+
+def get_collector():
+    """
+    Return the configured collector. It's created once and shared.
+    """
+    global _collector
+    if _collector is None:
+        with _collector_lock:
+            if _collector is None:
+                path = get_app_settings().get('INSTRUMENTATION_COLLECTOR',
+                                              DEFAULT_COLLECTOR)
+                collector_class = get_object_from_string(
+                    path, 'INSTRUMENTATION_COLLECTOR')
+                _collector = collector_class()
+    return _collector
+
+
+def count_queries():
+    """
+    How many queries has the default connection recorded? None if it isn't
+    recording them.
+    """
+    if settings.DEBUG or connection.use_debug_cursor:
+        return len(connection.queries)
+    return None
+
+
+class Timing(object):
+    """
+    One timed operation.
+    """
+
+    def __init__(self, operation, duration, queries=None, item_type=None,
+                 type_counts=None, extra=None):
+        self.operation = operation
+        self.duration = duration
+        self.queries = queries
+        # For operations on a single item, which type it was.
+        self.item_type = item_type
+        # For operations on several items, how many of each type, by slug.
+        self.type_counts = type_counts or {}
+        self.extra = extra or {}
+
+    @property
+    def item_count(self):
+        if self.item_type is not None:
+            return 1
+        return sum(self.type_counts.values())
+
+    def __repr__(self):
+        return '<Timing: {} {:.6f}s>'.format(self.operation, self.duration)
+
+
+def record(timing):
+    get_collector().record(timing)
+    timing_recorded.send(sender=Timing, timing=timing)
+
+
+class Timer(object):
+    """
+    Time a block of code:
+        with timed('area.render') as timer:
+            ...
+            timer.set_items(items)
+    """
+
+    def __init__(self, operation, item_type=None):
+        self.operation = operation
+        self.item_type = item_type
+        self.type_counts = None
+        self.extra = {}
+
+    def __enter__(self):
+        self.queries = count_queries()
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.time() - self.start
+        # Failures aren't timings worth keeping.
+        if exc_type is not None:
+            return
+        queries = count_queries()
+        if queries is not None and self.queries is not None:
+            queries -= self.queries
+        record(Timing(self.operation, duration, queries, self.item_type,
+                      self.type_counts, self.extra))
+
+    def set_items(self, items):
+        type_counts = defaultdict(int)
+        for item in items:
+            type_counts[item.get_type_slug()] += 1
+        self.type_counts = dict(type_counts)
+
+    def set(self, **extra):
+        self.extra.update(extra)
+
+
+class NullTimer(object):
+    """
+    Stands in for a Timer when instrumentation is off.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def set_items(self, items):
+        pass
+
+    def set(self, **extra):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timed(operation, item_type=None):
+    """
+    Return a Timer for the given operation, or, if instrumentation is off, a
+    shared one that does nothing.
+    """
+    if not instrumentation_enabled():
+        return NULL_TIMER
+    return Timer(operation, item_type)
+
+
+def instrumented(operation, get_items=None):
+    """
+    Time every call to the decorated function. get_items, if given, is
+    called with the function's result and arguments, and returns the items
+    the call dealt with, so they can be counted.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation_enabled():
+                return func(*args, **kwargs)
+            with Timer(operation) as timer:
+                result = func(*args, **kwargs)
+                if get_items is not None:
+                    timer.set_items(get_items(result, *args, **kwargs))
+            return result
+        return wrapper
+    return decorator
+
+
+def timed_iterator(operation, items):
+    """
+    Pass through the items from an iterator, timing only how long it takes
+    to produce them (not what's done with each one in between). The timing
+    is recorded when the iterator runs out or is abandoned.
+    """
+    duration = 0.0
+    queries = 0
+    type_counts = defaultdict(int)
+    counting_queries = count_queries() is not None
+    try:
+        while True:
+            queries_before = count_queries()
+            start = time.time()
+            try:
+                item = next(items)
+            finally:
+                duration += time.time() - start
+                if counting_queries:
+                    queries += count_queries() - queries_before
+            type_counts[item.get_type_slug()] += 1
+            yield item
+    except StopIteration:
+        pass
+    finally:
+        record(Timing(operation, duration,
+                      queries if counting_queries else None,
+                      type_counts=dict(type_counts)))
+
+
+def get_percentile(sorted_values, percentile):
+    """
+    Return the nearest-rank percentile of some sorted values.
+    """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percentile / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+class BaseCollector(object):
+    """
+    Receives every Timing. Subclass this to send them to your metrics
+    service, and implement record().
+    """
+
+    def record(self, timing):
+        raise NotImplementedError
+
+
+class MemoryCollector(BaseCollector):
+    """
+    Keep the most recent durations for each operation, and for each item
+    type's renders, in this process. How many are kept of each is
+    FLEXIBLE_CONTENT['INSTRUMENTATION_SAMPLES'] (1000 by default).
+    """
+
+    percentiles = (50, 90, 99)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.max_samples = get_app_settings().get('INSTRUMENTATION_SAMPLES',
+                                                  1000)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.operations = defaultdict(self._make_stats)
+            self.item_types = defaultdict(self._make_stats)
+
+    def _make_stats(self):
+        return {'count': 0, 'queries': 0, 'items': 0,
+                'durations': deque(maxlen=self.max_samples)}
+
+    def record(self, timing):
+        with self.lock:
+            stats = [self.operations[timing.operation]]
+            if timing.operation == 'item.render' and timing.item_type:
+                stats.append(self.item_types[timing.item_type])
+            for s in stats:
+                s['count'] += 1
+                s['queries'] += timing.queries or 0
+                s['items'] += timing.item_count
+                s['durations'].append(timing.duration)
+
+    def _summarize(self, stats):
+        durations = sorted(stats['durations'])
+        summary = {
+            'count': stats['count'],
+            'queries': stats['queries'],
+            'items': stats['items'],
+        }
+        for p in self.percentiles:
+            summary['p{}'.format(p)] = get_percentile(durations, p)
+        return summary
+
+    def get_summary(self):
+        """
+        Return the call counts, total queries and items, and duration
+        percentiles (in seconds) for each operation, and for rendering each
+        item type.
+        """
+        with self.lock:
+            return {
+                'operations': dict((name, self._summarize(s)) for name, s
+                                   in self.operations.items()),
+                'item_types': dict((slug, self._summarize(s)) for slug, s
+                                   in self.item_types.items()),
+            }
+
+    def get_render_percentiles(self, type_slug):
+        """
+        Return the duration percentiles for rendering one type of item, e.g.
+        {50: 0.0012, 90: 0.003, 99: 0.01}.
+        """
+        summary = self.get_summary()['item_types'].get(type_slug)
+        if summary is None:
+            return {}
+        return dict((p, summary['p{}'.format(p)]) for p in self.percentiles)
@@ -0,0 +1,16 @@
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+from flexible_content.models import BaseItem
+
+
+class Command(NoArgsCommand):
+    help = ("Record the concrete type of content items that were saved "
+            "before BaseItem had an item_ct column.")
+
+    @transaction.commit_on_success
+    def handle_noargs(self, **options):
+        updated = BaseItem.objects.backfill_item_types()
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Recorded the type of {} item(s).".
+                              format(updated))
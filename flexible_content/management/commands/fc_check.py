@@ -0,0 +1,18 @@
+from django.core.management.base import CommandError, NoArgsCommand
+
+from flexible_content.registry import build_item_types, check_item_types
+
+
+class Command(NoArgsCommand):
+    help = ("Check that the configured content item types can be loaded, "
+            "have templates, and don't share type slugs.")
+
+    def handle_noargs(self, **options):
+        item_types = build_item_types()
+        errors = check_item_types(item_types)
+        if errors:
+            raise CommandError('\n'.join(errors))
+
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("{} item type(s) look good: {}.".format(
+                len(item_types), ', '.join(t.slug for t in item_types)))
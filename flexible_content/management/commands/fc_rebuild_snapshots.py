@@ -0,0 +1,68 @@
+from optparse import make_option
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from flexible_content.models import (AreaSnapshot, BaseItem, ContentArea,
+                                     get_concrete_subclasses)
+from flexible_content.snapshots import snapshots_enabled
+from flexible_content.utils import iter_pk_batches
+
+
+# How many areas to rebuild per transaction.
+REBUILD_BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = ("Build (or rebuild) the snapshot of every area's content. Areas "
+            "are loaded and their items prefetched in batches, and each "
+            "batch is saved in its own transaction.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size',
+                    default=None,
+                    help="How many areas to rebuild per transaction."),
+        make_option('--missing', action='store_true', dest='missing',
+                    default=False,
+                    help="Only build snapshots for areas without one. "
+                         "After snapshots have been turned off for a "
+                         "while, rebuild them all instead."),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            raise CommandError("Command doesn't accept any arguments.")
+        if not snapshots_enabled():
+            raise CommandError("Snapshots aren't enabled. Set "
+                               "FLEXIBLE_CONTENT['AREA_SNAPSHOTS'] first, "
+                               "so they're kept up to date afterwards.")
+
+        batch_size = options.get('batch_size') or REBUILD_BATCH_SIZE
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        rebuilt = 0
+        for model in get_concrete_subclasses(ContentArea):
+            if not snapshots_enabled(model):
+                continue
+            area_ct = ContentType.objects.get_for_model(model)
+            for pks in iter_pk_batches(model._base_manager.all(),
+                                       batch_size):
+                if options.get('missing'):
+                    existing = set(AreaSnapshot.objects.
+                                   filter(content_area_ct=area_ct,
+                                          content_area_id__in=pks).
+                                   values_list('content_area_id', flat=True))
+                    pks = [pk for pk in pks if pk not in existing]
+                    if not pks:
+                        continue
+                with transaction.commit_on_success():
+                    batch = BaseItem.objects.prefetch_for_areas(
+                        model._base_manager.filter(pk__in=pks))
+                    for area in batch:
+                        AreaSnapshot.objects.rebuild(area)
+                rebuilt += len(pks)
+
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Rebuilt {} snapshot(s).".format(rebuilt))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flexible_content.default_item_types.video_metadata import \
+    refresh_video_metadata
+
+
+class Command(BaseCommand):
+    help = ("Fetch titles, thumbnails, durations and aspect ratios for "
+            "videos that don't have them yet, and store them so pages can "
+            "be rendered without asking the video services. Meant to be run "
+            "from cron.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--max-age', type='float', dest='max_age', default=None,
+                    help="Also refetch metadata older than this many "
+                         "hours."),
+        make_option('--all', action='store_true', dest='all', default=False,
+                    help="Refetch every video's metadata."),
+        make_option('--batch-size', type='int', dest='batch_size',
+                    default=None,
+                    help="How many videos to fetch at once."),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            raise CommandError("Command doesn't accept any arguments.")
+
+        max_age = options.get('max_age')
+        if options.get('all'):
+            max_age = timedelta(0)
+        elif max_age is not None:
+            max_age = timedelta(hours=max_age)
+        batch_size = options.get('batch_size')
+        if batch_size is not None and batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        refreshed, failed = refresh_video_metadata(max_age=max_age,
+                                                   batch_size=batch_size)
+
+        if int(options.get('verbosity', 1)):
+            self.stdout.write("Refreshed metadata for {} video(s); {} "
+                              "couldn't be fetched.".format(refreshed,
+                                                            failed))
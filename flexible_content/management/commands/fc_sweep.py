@@ -0,0 +1,53 @@
+from datetime import timedelta
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flexible_content.models import BaseItem, TemporaryArea
+
+
+class Command(BaseCommand):
+    help = ("Delete temporary areas left behind by the admin, and content "
+            "items whose area no longer exists. Safe to run from cron: rows "
+            "are deleted in small batches, each in its own transaction.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--max-age', type='float', dest='max_age', default=None,
+                    help="Only delete temporary areas older than this many "
+                         "hours. Defaults to FLEXIBLE_CONTENT"
+                         "['TEMPORARY_AREA_MAX_AGE'], or a day."),
+        make_option('--batch-size', type='int', dest='batch_size',
+                    default=None,
+                    help="How many rows to delete per transaction."),
+        make_option('--dry-run', action='store_true', dest='dry_run',
+                    default=False,
+                    help="Count what would be deleted, but don't delete it."),
+        make_option('--include-uninstalled', action='store_true',
+                    dest='include_uninstalled', default=False,
+                    help="Also delete items whose area model isn't "
+                         "installed. Without this, they're skipped."),
+    )
+
+    def handle(self, *args, **options):
+        if args:
+            raise CommandError("Command doesn't accept any arguments.")
+
+        max_age = options.get('max_age')
+        if max_age is not None:
+            max_age = timedelta(hours=max_age)
+        batch_size = options.get('batch_size')
+        if batch_size is not None and batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        dry_run = options.get('dry_run', False)
+
+        areas = TemporaryArea.objects.sweep(max_age=max_age,
+                                            batch_size=batch_size,
+                                            dry_run=dry_run)
+        items = BaseItem.objects.sweep_orphans(
+            batch_size=batch_size, dry_run=dry_run,
+            include_uninstalled=options.get('include_uninstalled', False))
+
+        if int(options.get('verbosity', 1)):
+            verb = "Would delete" if dry_run else "Deleted"
+            self.stdout.write("{} {} temporary area(s) and {} orphaned "
+                              "item(s).".format(verb, areas, items))
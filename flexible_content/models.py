@@ -16,32 +16,178 @@ video (or even an arbitrary, custom type of thing) to be assigned to a model
 instance (such as a page, a blog post, a sidebar, etc).
 """
 
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
 from django import forms
 from django.conf import settings
 from django.contrib.contenttypes.generic import (GenericForeignKey,
                                                  GenericRelation)
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Q, get_models
+from django.db.models.query import QuerySet
 from django.forms import ModelForm
-from django.template.loader import render_to_string
+from django.template import Context
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
-from model_utils.managers import InheritanceManager
+from model_utils.managers import InheritanceManager, InheritanceQuerySet
+
+from .cache import (area_cache_enabled,
+                    get_area_variant,
+                    get_cached_area_content,
+                    get_cached_areas_content,
+                    get_cached_item_content,
+                    render_items,
+                    set_cached_area_content,
+                    set_cached_item_content)
+from .forms import get_auto_form_class
+from .instrumentation import instrumentation_enabled, timed, timed_iterator
+from .rendering import get_item_template, get_template_names
+from .registry import get_item_types
+from .snapshots import area_changed, snapshots_enabled
+from .utils import (SPLIT_LOADING,
+                    get_app_settings,
+                    get_item_loading,
+                    iter_chunks,
+                    iter_pk_batches)
+
+
+# How many items to downcast at a time when split loading. Each batch's
+# primary keys go in a `pk__in` lookup, and SQLite won't take more than 999
+# parameters in a query.
+SPLIT_LOADING_BATCH_SIZE = 500
+# Each item reordered in bulk takes three query parameters.
+BULK_REORDER_BATCH_SIZE = 300
+# How many temporary areas or orphaned items to delete per transaction when
+# sweeping. Keep it small enough that no batch holds locks for long.
+SWEEP_BATCH_SIZE = 500
+
+# How many items to render at a time when streaming an area.
+STREAMING_CHUNK_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def get_concrete_subclasses(model):
+    """
+    Return the installed, concrete subclasses of a model (at any depth), with
+    the most deeply inherited ones first.
+    """
+    subclasses = [m for m in get_models()
+                  if issubclass(m, model) and m is not model and
+                  not m._meta.proxy]
+    subclasses.sort(key=lambda m: len(m._meta.get_parent_list()),
+                    reverse=True)
+    return subclasses
+
+
+class BaseItemQuerySet(InheritanceQuerySet):
+    """
+    Adds split_subclasses(), an alternative to select_subclasses().
+
+    Instead of LEFT JOINing every subclass's table in one query, it fetches
+    the plain BaseItem rows first, then queries the table of each type that
+    turned up for just those rows, and puts the results back in the original
+    order. That's a few more queries, but each one stays narrow no matter how
+    many item types exist.
+    """
+
+    _split_subclasses = False
+    # If instrumentation is on, loading these items is timed under this name
+    # (see instrumentation.py).
+    _timed_as = None
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        kwargs.setdefault('_split_subclasses', self._split_subclasses)
+        kwargs.setdefault('_timed_as', self._timed_as)
+        return super(BaseItemQuerySet, self)._clone(klass, setup, **kwargs)
+
+    def iterator(self):
+        if self._split_subclasses:
+            items = self._split_iterator()
+        else:
+            items = super(BaseItemQuerySet, self).iterator()
+        if self._timed_as is not None and instrumentation_enabled():
+            items = timed_iterator(self._timed_as, items)
+        for item in items:
+            yield item
+
+    def timed_as(self, operation):
+        return self._clone(_timed_as=operation)
+
+    def split_subclasses(self):
+        return self._clone(_split_subclasses=True)
+
+    def _split_iterator(self):
+        # Get the lightweight BaseItem rows, in order. Skip past
+        # InheritanceQuerySet, so nothing gets joined. Cast them in batches,
+        # so we never hold more than a batch's worth of rows.
+        base_items = super(InheritanceQuerySet, self).iterator()
+        for batch in iter_chunks(base_items, SPLIT_LOADING_BATCH_SIZE):
+            for item in self._cast_batch(batch):
+                yield item
+
+    def _cast_batch(self, base_items):
+        """
+        Return the given BaseItems, each downcast to its real type.
+        """
+        # Query only the types that are actually present, per the concrete
+        # type each row recorded when it was saved.
+        pks_by_model = defaultdict(list)
+        untyped_pks = []
+        for i in base_items:
+            model = i.get_item_model()
+            if model is None:
+                untyped_pks.append(i.pk)
+            elif model is not type(i):
+                pks_by_model[model].append(i.pk)
+        casted = {}
+        for model, pks in pks_by_model.items():
+            casted.update(self._get_by_pk(model, pks))
+
+        # Rows saved before the type was recorded have to be looked for in
+        # each subclass's table. The deepest subclasses come first, so each
+        # row ends up as its most specific type.
+        for model in get_concrete_subclasses(self.model):
+            remaining = [pk for pk in untyped_pks if pk not in casted]
+            if not remaining:
+                break
+            casted.update(self._get_by_pk(model, remaining))
+
+        # Anything that isn't in a subclass table stays a plain BaseItem, just
+        # like with select_subclasses().
+        return [casted.get(i.pk, i) for i in base_items]
 
-from .forms import BaseItemForm
-from .utils import (get_app_settings,
-                    get_model_from_string,
-                    get_models_from_strings)
+    def _get_by_pk(self, model, pks):
+        """
+        Return a dictionary of the given model's instances, by primary key.
+        """
+        qs = model._base_manager.using(self.db).filter(pk__in=pks)
+        return dict((i.pk, i) for i in qs)
 
 
 class BaseItemManager(InheritanceManager):
-    def get_for_area(self, area):
+    def get_query_set(self):
+        return BaseItemQuerySet(self.model, using=self._db)
+
+    def split_subclasses(self):
+        return self.get_query_set().split_subclasses()
+
+    def get_for_area(self, area, loading=None):
         """
         Returns all items belonging to a given model instance, casted to their
         real types.
 
         Note that all queries (even the ones on the model) should go through
         this manager.
+
+        The items are downcast with the area's loading strategy (see
+        ContentArea.item_loading), unless another one is given.
         """
 
         # Get the uncasted items tied to the given area.
@@ -49,13 +195,184 @@ class BaseItemManager(InheritanceManager):
         qs = BaseItem.objects.filter(content_area_ct=content_type,
                                      content_area_id=area.pk)
         # Order those items!
-        qs = qs.order_by('ordering', 'pk')
+        qs = qs.order_by('ordering', 'pk').timed_as('items.load')
 
-        # Use InheritanceManager to automatically (and without extra queries)
-        # downcast each item via the OneToOneField multi-table inhertiance
-        # creates.
+        # If we're asked to, downcast each item with a query per type.
+        if loading is None:
+            loading = area.get_item_loading()
+        if get_item_loading(loading) == SPLIT_LOADING:
+            return qs.split_subclasses()
+
+        # Otherwise, use InheritanceManager to automatically (and without
+        # extra queries) downcast each item via the OneToOneField multi-table
+        # inhertiance creates.
         return qs.select_subclasses()
 
+    def prefetch_for_areas(self, areas, loading=None):
+        """
+        Load the items for several areas (of any ContentArea subclass) in a
+        single query, and attach them to their areas so that `items` and
+        `get_rendered_content` don't query again.
+
+        The items are downcast with each area's loading strategy (see
+        ContentArea.item_loading), so areas that load differently are
+        fetched with a query per strategy, unless one is given for them all.
+
+        Returns the areas as a list.
+        """
+        areas = list(areas)
+        if loading is not None:
+            self._prefetch_with_loading(areas, loading)
+            return areas
+
+        areas_by_loading = defaultdict(list)
+        for area in areas:
+            areas_by_loading[area.get_item_loading()].append(area)
+        for strategy, strategy_areas in sorted(areas_by_loading.items()):
+            self._prefetch_with_loading(strategy_areas, strategy)
+        return areas
+
+    def _prefetch_with_loading(self, areas, loading):
+        if not areas:
+            return
+
+        # Group the areas' primary keys by content type, and query for all of
+        # their items at once.
+        area_pks_by_ct = defaultdict(set)
+        for area in areas:
+            area_pks_by_ct[area.get_content_type().pk].add(area.pk)
+        query = Q()
+        for ct_pk, area_pks in area_pks_by_ct.items():
+            query |= Q(content_area_ct=ct_pk, content_area_id__in=area_pks)
+        qs = BaseItem.objects.filter(query).order_by('ordering', 'pk')
+        if get_item_loading(loading) == SPLIT_LOADING:
+            qs = qs.split_subclasses()
+        else:
+            qs = qs.select_subclasses()
+
+        # Sort the downcast items into their areas, keeping their order.
+        items_by_area = defaultdict(list)
+        for item in qs:
+            key = (item.content_area_ct_id, item.content_area_id)
+            items_by_area[key].append(item)
+        for area in areas:
+            key = (area.get_content_type().pk, area.pk)
+            area._prefetched_items = items_by_area[key]
+
+    def backfill_item_types(self):
+        """
+        Record the concrete type of any items saved before BaseItem had an
+        item_ct field. Returns the number of items updated.
+        """
+        updated = 0
+        # The deepest subclasses come first, so each row ends up as its most
+        # specific type.
+        for model in get_concrete_subclasses(self.model):
+            model_pks = model._base_manager.values('pk')
+            qs = BaseItem.objects.filter(item_ct__isnull=True,
+                                         pk__in=model_pks)
+            updated += qs.update(
+                item_ct=ContentType.objects.get_for_model(model))
+        return updated
+
+    def sweep_orphans(self, batch_size=None, dry_run=False,
+                      include_uninstalled=False):
+        """
+        Delete items whose area no longer exists, `batch_size` at a time,
+        each batch in its own transaction. Returns the number of items
+        deleted, or with `dry_run`, the number that would have been.
+
+        Items whose area model isn't installed are left alone (and logged),
+        since an app missing from INSTALLED_APPS is more likely a mistake
+        than a removal. Pass `include_uninstalled` to delete them too.
+        """
+        batch_size = batch_size or SWEEP_BATCH_SIZE
+        found = 0
+
+        # Check each kind of area separately.
+        area_ct_ids = list(self.order_by().distinct().
+                           values_list('content_area_ct', flat=True))
+        # Not get_for_id(), which can't cope with uninstalled models.
+        for area_ct in ContentType.objects.filter(pk__in=area_ct_ids):
+            area_ct_id = area_ct.pk
+            area_model = area_ct.model_class()
+            items = self.filter(content_area_ct=area_ct_id)
+            if area_model is None and not include_uninstalled:
+                logger.warning("Not sweeping the items of %s.%s, since that "
+                               "model isn't installed.", area_ct.app_label,
+                               area_ct.model)
+                continue
+            for rows in iter_pk_batches(items, batch_size,
+                                        fields=('content_area_id',)):
+                area_ids = set(area_id for pk, area_id in rows)
+                if area_model is None:
+                    existing = set()
+                else:
+                    existing = set(area_model._base_manager.using(self.db).
+                                   filter(pk__in=area_ids).
+                                   values_list('pk', flat=True))
+                orphan_pks = [pk for pk, area_id in rows
+                              if area_id not in existing]
+
+                found += len(orphan_pks)
+                if orphan_pks and not dry_run:
+                    with transaction.commit_on_success(using=self.db):
+                        self.filter(pk__in=orphan_pks).delete()
+        return found
+
+    def bulk_reorder(self, orderings):
+        """
+        Set the ordering of several items at once, given a dictionary mapping
+        their primary keys to their new orderings. Their modification times
+        are bumped too, just like a save would.
+
+        This is one UPDATE (per few hundred items, to stay under SQLite's
+        parameter limit) with a CASE on the primary key, rather than a save
+        per item. It doesn't commit; it's meant to run inside the caller's
+        transaction. The areas the items belong to are re-rendered, just as
+        saving the items would.
+        """
+        if not orderings:
+            return
+        areas = set()
+        for batch in iter_chunks(list(orderings), BULK_REORDER_BATCH_SIZE):
+            areas.update(self.filter(pk__in=batch).values_list(
+                'content_area_ct', 'content_area_id').distinct())
+
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        opts = BaseItem._meta
+        modified = opts.get_field('modified').get_db_prep_value(
+            timezone.now(), connection=connection)
+
+        sql_template = ('UPDATE {table} SET {ordering} = CASE {pk} {cases} '
+                        'END, {modified} = %s WHERE {pk} IN ({pks})')
+        cursor = connection.cursor()
+        for batch in iter_chunks(sorted(orderings.items()),
+                                 BULK_REORDER_BATCH_SIZE):
+            sql = sql_template.format(
+                table=qn(opts.db_table),
+                ordering=qn(opts.get_field('ordering').column),
+                modified=qn(opts.get_field('modified').column),
+                pk=qn(opts.pk.column),
+                cases=' '.join(['WHEN %s THEN %s'] * len(batch)),
+                pks=', '.join(['%s'] * len(batch)))
+            params = []
+            for pk, ordering in batch:
+                params.extend([pk, ordering])
+            params.append(modified)
+            params.extend(pk for pk, ordering in batch)
+            cursor.execute(sql, params)
+
+        # Raw SQL doesn't tell the transaction machinery that there's
+        # something to commit. (Outside of managed transactions, it's already
+        # been committed.)
+        if transaction.is_managed(using=self.db):
+            transaction.set_dirty(using=self.db)
+
+        for area_ct_id, area_id in sorted(areas):
+            area_changed(area_ct_id, area_id)
+
 
 class BaseItem(models.Model):
     """
@@ -71,6 +388,14 @@ class BaseItem(models.Model):
     # Relative to other items, where does this one belong?
     ordering = models.IntegerField(default=1, db_index=True)
 
+    # When was this item last changed? Rendered fragments are cached by this.
+    modified = models.DateTimeField(auto_now=True)
+
+    # What type is this item, really? This is filled in on save, so items can
+    # be downcast or filtered by type without joining every subclass's table.
+    item_ct = models.ForeignKey(ContentType, related_name='+', null=True,
+                                editable=False)
+
     objects = BaseItemManager()
 
     class FlexibleContentInfo:
@@ -82,6 +407,67 @@ class BaseItem(models.Model):
     class Meta:
         ordering = ['ordering', 'pk']
 
+    def __init__(self, *args, **kwargs):
+        area = kwargs.get('content_area')
+        super(BaseItem, self).__init__(*args, **kwargs)
+        # The generic foreign key turns content_area into its two fields
+        # without keeping the instance; keep it, so the item can tell the
+        # area when it changes (see forget_area_content).
+        if area is not None:
+            setattr(self, BaseItem.content_area.cache_attr, area)
+        # Remember which area this item was loaded with, so if it's moved,
+        # the area it left gets re-rendered too. Read the values directly,
+        # so deferred fields aren't loaded just for this.
+        self._original_area = (self.__dict__.get('content_area_ct_id'),
+                               self.__dict__.get('content_area_id'))
+
+    def get_changed_areas(self):
+        """
+        Return the (content type ID, ID) of each area that saving or
+        deleting this item changes: the one it belongs to, and the one it
+        was loaded with, if it's been moved since.
+        """
+        areas = [(self.content_area_ct_id, self.content_area_id)]
+        original = getattr(self, '_original_area', (None, None))
+        if original[1] is not None and original not in areas:
+            areas.append(original)
+        return areas
+
+    def delete(self, *args, **kwargs):
+        """
+        Make sure the area this item belonged to gets re-rendered.
+        """
+        areas = self.get_changed_areas()
+        super(BaseItem, self).delete(*args, **kwargs)
+        for area_ct_id, area_id in areas:
+            area_changed(area_ct_id, area_id)
+        self.forget_area_content()
+
+    def save(self, *args, **kwargs):
+        """
+        Record this item's concrete type, and make sure the area it belongs to
+        (and any it was moved from) gets re-rendered.
+        """
+        # A plain BaseItem doesn't know what it really is, so leave it alone.
+        if type(self) is not BaseItem:
+            self.item_ct = ContentType.objects.get_for_model(self)
+
+        super(BaseItem, self).save(*args, **kwargs)
+        for area_ct_id, area_id in self.get_changed_areas():
+            area_changed(area_ct_id, area_id)
+        self._original_area = (self.content_area_ct_id, self.content_area_id)
+        self.forget_area_content()
+
+    def forget_area_content(self):
+        """
+        If this item holds its area's instance (say, it was created with
+        content_area=area), make that instance forget what it's loaded, so
+        it doesn't keep showing the items as they were.
+        """
+        area = getattr(self, BaseItem.content_area.cache_attr, None)
+        if area is not None and hasattr(area, 'forget_items'):
+            area.forget_items()
+
     def get_casted(self):
         """
         Ensure that this instance isn't merely a BaseItem, but casted to its
@@ -89,8 +475,14 @@ class BaseItem(models.Model):
         """
 
         item = self
-        # If this isn't a *subclass* of BaseItem, query for the subclass's item
-        if type(item) not in BaseItem.__subclasses__():
+        model = item.get_item_model()
+
+        # If we know the real type, query that type's table directly.
+        if model is not None:
+            if not isinstance(item, model):
+                item = model._base_manager.get(pk=item.pk)
+        # If not, query for the subclass's item the long way.
+        elif type(item) is BaseItem:
             item = BaseItem.objects.all().select_subclasses().get(pk=item.pk)
         return item
 
@@ -99,23 +491,20 @@ class BaseItem(models.Model):
         """
         Return a list of available item types.
         """
-
-        # Do the settings define classes?
-        configured_types = get_app_settings().get('ITEM_TYPES', None)
-
-        # If there are types chosen, import them.
-        if configured_types is not None:
-            configured_types = get_models_from_strings(configured_types)
-        # If not, grab the defaults.
-        else:
-            from .default_item_types.models import DEFAULT_TYPES
-            configured_types = DEFAULT_TYPES
-
-        return tuple(configured_types)
+        return tuple(t.model for t in get_item_types())
 
     def get_content_type(self):
         return ContentType.objects.get_for_model(self)
 
+    def get_item_model(self):
+        """
+        Return this item's concrete model class, as recorded when it was
+        saved, or None if it wasn't recorded.
+        """
+        if self.item_ct_id is None:
+            return None
+        return ContentType.objects.get_for_id(self.item_ct_id).model_class()
+
     def get_form_class(self):
         """
         You'll want to either specify a form class in your FlexibleContentInfo
@@ -128,12 +517,9 @@ class BaseItem(models.Model):
         # Try to get an explicit form class first.
         form_class = getattr(self.FlexibleContentInfo, 'form_class', None)
 
-        # If we didn't find one there, create a form on the fly.
+        # If we didn't find one there, use one generated on the fly.
         if form_class is None:
-            name = 'AutoGenerated{}Form'.format(self.__class__.__name__)
-            form_class_meta = type('Meta', (BaseItemForm.Meta,),
-                                   {'model': self.__class__})
-            form_class = type(name, (BaseItemForm,), {'Meta': form_class_meta})
+            form_class = get_auto_form_class(self.__class__)
 
         return form_class
 
@@ -158,15 +544,50 @@ class BaseItem(models.Model):
     def get_rendered_content(self):
         """
         Use the template to render this instance's data, and cache it on the
-        instance.
+        instance (and, if FLEXIBLE_CONTENT['CACHE_RENDERED_ITEMS'] is set, in
+        the fragment cache).
         """
         if getattr(self, '_rendered_content', None) is None:
-            self._rendered_content = render_to_string(self.get_template_name(),
-                                                      {'item': self})
+            self._rendered_content = get_cached_item_content(self)
+            if self._rendered_content is None:
+                self._rendered_content = self.render_content()
+                set_cached_item_content(self, self._rendered_content)
         return self._rendered_content
 
+    def get_serialized_fields(self):
+        """
+        Return this item's own fields as a dictionary, for the JSON API (see
+        serializers.py). Override this to send something else.
+        """
+        from .serializers import get_field_value, get_item_fields
+        return dict((f.name, get_field_value(self, f))
+                    for f in get_item_fields(self))
+
+    def render_content(self, namespace=None):
+        """
+        Render this instance's template (looking in the given template
+        namespace first), without consulting any caches (other than the
+        compiled template registry).
+        """
+        with timed('item.render', item_type=self.get_type_slug()):
+            template = get_item_template(self.get_template_names(namespace))
+            return template.render(Context({'item': self}))
+
     def get_template_name(self):
-        return 'flexible-content/{}.html'.format(self.get_type_slug())
+        return get_template_names(self.get_type_slug())[-1]
+
+    def get_template_names(self, namespace=None):
+        """
+        Return the templates to try for this item: any override for the type
+        of area it belongs to (and the given namespace), then the one
+        get_template_name() names.
+        """
+        area_model = None
+        if self.content_area_ct_id is not None:
+            area_model = (ContentType.objects.
+                          get_for_id(self.content_area_ct_id).model_class())
+        return get_template_names(self.get_type_slug(), area_model,
+                                  namespace, self.get_template_name())
 
     def get_type_description(self):
         return getattr(self.FlexibleContentInfo, 'description', '')
@@ -188,41 +609,417 @@ class BaseItem(models.Model):
         return slug
 
 
+class AreaSnapshotManager(models.Manager):
+    def get_for_area(self, area):
+        snapshots = list(self.filter(
+            content_area_ct=area.get_content_type(),
+            content_area_id=area.pk)[:1])
+        return snapshots[0] if snapshots else None
+
+    def get_for_areas(self, areas):
+        """
+        Load the snapshots for several areas in one query. Returns a
+        dictionary of them keyed by (content_area_ct_id, content_area_id).
+        """
+        area_pks_by_ct = defaultdict(set)
+        for area in areas:
+            area_pks_by_ct[area.get_content_type().pk].add(area.pk)
+        if not area_pks_by_ct:
+            return {}
+        query = Q()
+        for ct_pk, area_pks in area_pks_by_ct.items():
+            query |= Q(content_area_ct=ct_pk, content_area_id__in=area_pks)
+        return dict(((s.content_area_ct_id, s.content_area_id), s)
+                    for s in self.filter(query))
+
+    def rebuild(self, area):
+        """
+        Serialize and render an area's items, and store them as its
+        snapshot, replacing any old one. This runs in the caller's
+        transaction, so it's committed (or rolled back) along with whatever
+        changed the items.
+        """
+        from .serializers import serialize_item
+
+        items = area.get_items()
+        data = {
+            'items': json.dumps([serialize_item(i) for i in items],
+                                cls=DjangoJSONEncoder),
+            'rendered_content': '\n\n'.join(render_items(items)),
+            'modified': timezone.now(),
+        }
+        lookup = {
+            'content_area_ct': area.get_content_type(),
+            'content_area_id': area.pk,
+        }
+
+        # Update the existing row if there is one. If not, insert one, but
+        # someone else might have just done the same, so be ready to update
+        # theirs instead (like get_or_create does).
+        if not self.filter(**lookup).update(**data):
+            data.update(lookup)
+            sid = transaction.savepoint(using=self.db)
+            try:
+                self.create(**data)
+                transaction.savepoint_commit(sid, using=self.db)
+            except IntegrityError:
+                transaction.savepoint_rollback(sid, using=self.db)
+                self.filter(**lookup).update(**data)
+        snapshot = self.get_for_area(area)
+        area._snapshot = snapshot
+        return snapshot
+
+
+class AreaSnapshot(models.Model):
+    """
+    An area's serialized items and rendered content, kept up to date as its
+    items change, so the area can be read with one lookup. See snapshots.py.
+    """
+
+    content_area_ct = models.ForeignKey(ContentType, related_name='+')
+    content_area_id = models.PositiveIntegerField()
+    content_area = GenericForeignKey(ct_field='content_area_ct',
+                                     fk_field='content_area_id')
+
+    # The items, as serialize_item() gives them, in JSON.
+    items = models.TextField()
+    rendered_content = models.TextField()
+    modified = models.DateTimeField()
+
+    objects = AreaSnapshotManager()
+
+    class Meta:
+        unique_together = (('content_area_ct', 'content_area_id'),)
+
+    def get_items(self):
+        return json.loads(self.items)
+
+
+class ContentAreaQuerySet(QuerySet):
+    """
+    Adds prefetch_items(), which loads the items for every area in the
+    queryset with one extra query:
+        posts = BlogPost.objects.filter(published=True).prefetch_items()
+    """
+
+    _prefetch_items = False
+
+    def _clone(self, *args, **kwargs):
+        kwargs.setdefault('_prefetch_items', self._prefetch_items)
+        return super(ContentAreaQuerySet, self)._clone(*args, **kwargs)
+
+    def iterator(self):
+        areas = super(ContentAreaQuerySet, self).iterator()
+        if self._prefetch_items:
+            areas = BaseItem.objects.prefetch_for_areas(areas)
+        for area in areas:
+            yield area
+
+    def prefetch_items(self):
+        return self._clone(_prefetch_items=True)
+
+
+class ContentAreaManager(models.Manager):
+    def get_query_set(self):
+        return ContentAreaQuerySet(self.model, using=self._db)
+
+    def prefetch_items(self):
+        return self.get_query_set().prefetch_items()
+
+
 class ContentArea(models.Model):
     rendered_content = None
 
+    # How should this area's items be loaded? Either 'joined' or 'split' (see
+    # BaseItemQuerySet.split_subclasses). If None, the project's
+    # FLEXIBLE_CONTENT['ITEM_LOADING'] setting decides.
+    item_loading = None
+
+    # Can this area's items be read from the JSON API (see views.py)? Areas
+    # aren't public unless they opt in; see get_api_queryset() for limiting
+    # which of them are.
+    api_visible = False
+
+    # Should this area keep a snapshot of its content (see snapshots.py)?
+    # Only matters when FLEXIBLE_CONTENT['AREA_SNAPSHOTS'] is set.
+    use_snapshot = True
+
+    objects = ContentAreaManager()
+
+    # The raw, uncasted items. This is here so Django's deletion collector
+    # knows about them: deleting areas (one at a time, or in bulk from a
+    # queryset or the admin's changelist) deletes their items too, with a few
+    # set-based DELETEs per item table instead of loading each item. To get
+    # the items themselves, use `items`.
+    base_items = GenericRelation(BaseItem,
+                                 content_type_field='content_area_ct',
+                                 object_id_field='content_area_id')
+    # Likewise for the area's snapshot, if it has one.
+    snapshots = GenericRelation(AreaSnapshot,
+                                content_type_field='content_area_ct',
+                                object_id_field='content_area_id')
+
     class Meta:
         abstract = True
 
     def delete(self, *args, **kwargs):
         """
-        Ensure we delete content items too.
+        Delete the area, and its items along with it (see base_items).
         """
-
-        # What content items belong to this object?
-        dead_items = list(self.items)
-
-        # Delete the area.
+        # Deleting clears the primary key, so hold on to it.
+        area_ct_id, area_id = self.get_content_type().pk, self.pk
         super(ContentArea, self).delete(*args, **kwargs)
+        area_changed(area_ct_id, area_id)
 
-        # Delete the area's old items, just in case.
-        [i.delete() for i in dead_items]
+    @classmethod
+    def get_api_queryset(cls, request):
+        """
+        Return the areas the JSON API may serve for this request. Override
+        this to hide drafts, or areas the requesting user can't see:
+            @classmethod
+            def get_api_queryset(cls, request):
+                return cls.objects.filter(published=True)
+        """
+        return cls._default_manager.all()
 
     @property
     def items(self):
+        """
+        This area's items, in order, as a queryset. It always queries; to
+        use the items loaded by prefetch_items(), call get_items().
+        """
         return BaseItem.objects.get_for_area(self)
 
+    def get_items(self):
+        """
+        Return a list of this area's items, in order. If they were loaded by
+        prefetch_items() (or BaseItem.objects.prefetch_for_areas), that's
+        them, without a query, as they were when they were loaded (see
+        forget_items()).
+        """
+        prefetched = getattr(self, '_prefetched_items', None)
+        if prefetched is not None:
+            return list(prefetched)
+        return list(self.items)
+
+    def forget_items(self):
+        """
+        Drop anything this instance has loaded or rendered of its items (by
+        prefetching, rendering, or reading its snapshot), so the next read
+        fetches them again. Items saved or deleted through an instance that
+        holds this area call it for you.
+        """
+        for attr in ('rendered_content', '_prefetched_items',
+                     '_cached_variants', '_rendered_variants', '_snapshot'):
+            self.__dict__.pop(attr, None)
+
     def get_content_type(self):
         return ContentType.objects.get_for_model(self)
 
-    def get_rendered_content(self):
+    def get_item_loading(self):
+        return get_item_loading(self.item_loading)
+
+    def get_snapshot(self):
+        """
+        Return this area's AreaSnapshot, or None if it doesn't have one (or
+        snapshots are disabled).
+        """
+        if not snapshots_enabled(type(self)) or self.pk is None:
+            return None
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = AreaSnapshot.objects.get_for_area(self)
+        return self._snapshot
+
+    def iter_rendered_content(self):
+        """
+        Yields this area's content a piece at a time, for a
+        StreamingHttpResponse or anything else that would rather not wait for
+        (or hold) the whole thing.
+
+        Items are read from the database in chunks and rendered as they
+        arrive. Content that's already cached comes out in one piece, but
+        streamed content isn't cached, since that would mean holding all of
+        it.
+        """
+        # The {% prefetch_flexible_content %} tag may have looked in the
+        # cache already.
+        prefetched = getattr(self, '_cached_variants', {}).pop(None, None)
+        if self.rendered_content is None and prefetched is not None:
+            self.rendered_content = prefetched[0]
+        elif self.rendered_content is None and area_cache_enabled():
+            self.rendered_content = get_cached_area_content(self)[0]
+        if self.rendered_content is None and self.get_snapshot():
+            self.rendered_content = self.get_snapshot().rendered_content
+        if self.rendered_content is not None:
+            yield self.rendered_content
+            return
+
+        # Use prefetched items if there are some; otherwise, don't let the
+        # queryset hold on to every item.
+        items = getattr(self, '_prefetched_items', None)
+        if items is None:
+            items = self.items.iterator()
+
+        first = True
+        for chunk in iter_chunks(items, STREAMING_CHUNK_SIZE):
+            for content in render_items(chunk):
+                yield content if first else '\n\n' + content
+                first = False
+
+    def get_rendered_content(self, types=None, limit=None, namespace=None,
+                             timeout=None):
         """
         Returns all content items rendered into a single string (likely HTML).
+
+        If FLEXIBLE_CONTENT['CACHE_RENDERED_AREAS'] is set, the result is also
+        cached until one of this area's items changes, for `timeout` seconds
+        if that's given (0 skips the cache).
+
+        The other options render a variation on the content, which is cached
+        separately but invalidated along with the rest:
+            types      only items with these type slugs
+            limit      only the first this-many items, e.g. for previews
+            namespace  look for item templates under
+                       flexible-content/<namespace>/ first
         """
-        if self.rendered_content is None:
-            rendered_items = [i.get_rendered_content() for i in self.items]
-            self.rendered_content = '\n\n'.join(rendered_items)
-        return self.rendered_content
+        variant = get_area_variant(types, limit, namespace)
+        if variant is None:
+            if self.rendered_content is None:
+                with timed('area.render') as timer:
+                    self.rendered_content = self._render_content(
+                        timer, timeout=timeout)
+            return self.rendered_content
+
+        if not hasattr(self, '_rendered_variants'):
+            self._rendered_variants = {}
+        if self._rendered_variants.get(variant) is None:
+            with timed('area.render') as timer:
+                timer.set(variant=variant)
+                self._rendered_variants[variant] = self._render_content(
+                    timer, variant, types, limit, namespace, timeout)
+        return self._rendered_variants[variant]
+
+    def _render_content(self, timer, variant=None, types=None, limit=None,
+                        namespace=None, timeout=None):
+        content = version = None
+        use_cache = area_cache_enabled() and timeout != 0
+
+        # The {% prefetch_flexible_content %} tag may have looked in the
+        # cache already.
+        prefetched = getattr(self, '_cached_variants', {}).pop(variant, None)
+        if prefetched is not None:
+            content, version = prefetched
+        elif use_cache:
+            content, version = get_cached_area_content(self, variant)
+        if content is not None:
+            timer.set(source='cache')
+            return content
+
+        # Next best is the snapshot, which is one quick query.
+        if variant is None and self.get_snapshot():
+            timer.set(source='snapshot')
+            return self.get_snapshot().rendered_content
+
+        # If we couldn't get it from either, render it ourselves.
+        items = self.get_items_for_rendering(types, limit)
+        content = '\n\n'.join(render_items(items, namespace))
+        timer.set(source='render')
+        timer.set_items(items)
+        if use_cache and version is not None:
+            set_cached_area_content(self, content, version, variant, timeout)
+        return content
+
+    def get_items_for_rendering(self, types=None, limit=None):
+        """
+        Return a list of this area's items, or just the ones with the given
+        type slugs, or just the first `limit` of them.
+
+        Types are matched on the items' recorded item_ct, so items saved
+        before it existed are left out until fc_backfill_item_types has been
+        run (see the README's Upgrading section).
+        """
+        items = getattr(self, '_prefetched_items', None)
+        if items is not None:
+            if types:
+                items = [i for i in items if i.get_type_slug() in types]
+            return list(items[:limit] if limit is not None else items)
+
+        items = self.items
+        if types:
+            # Filter on the items' recorded types, so nothing is joined.
+            item_cts = [t.content_type_id for t in get_item_types()
+                        if t.slug in types]
+            items = items.filter(item_ct__in=item_cts)
+        if limit is not None:
+            items = items[:limit]
+        return list(items)
+
+
+def prefetch_rendered_content(areas, types=None, limit=None,
+                              namespace=None):
+    """
+    Get several areas (of any ContentArea subclass) ready to render with the
+    given options (see ContentArea.get_rendered_content), with as few round
+    trips as possible: one cache lookup for all of them, then one query for
+    the snapshots (or items) of the areas that weren't cached.
+
+    Returns the areas as a list.
+    """
+    areas = [a for a in areas if a is not None and a.pk is not None]
+    variant = get_area_variant(types, limit, namespace)
+
+    missing = areas
+    if area_cache_enabled():
+        cached = get_cached_areas_content(areas, variant)
+        missing = []
+        for area, (content, version) in zip(areas, cached):
+            if not hasattr(area, '_cached_variants'):
+                area._cached_variants = {}
+            area._cached_variants[variant] = (content, version)
+            if content is None:
+                missing.append(area)
+
+    # The full content can come from snapshots.
+    if variant is None and snapshots_enabled():
+        snapshot_areas = [a for a in missing
+                          if snapshots_enabled(type(a)) and
+                          not hasattr(a, '_snapshot')]
+        snapshots = AreaSnapshot.objects.get_for_areas(snapshot_areas)
+        for area in snapshot_areas:
+            area._snapshot = snapshots.get(
+                (area.get_content_type().pk, area.pk))
+        missing = [a for a in missing if a.get_snapshot() is None]
+
+    BaseItem.objects.prefetch_for_areas(
+        [a for a in missing if getattr(a, '_prefetched_items', None) is None])
+    return areas
+
+
+class TemporaryAreaManager(ContentAreaManager):
+    def sweep(self, max_age=None, batch_size=None, dry_run=False):
+        """
+        Delete temporary areas (and their items) that are older than
+        `max_age`, a timedelta, `batch_size` at a time, each batch in its own
+        transaction. Returns the number of areas deleted, or with `dry_run`,
+        the number that would have been.
+
+        If no age is given, FLEXIBLE_CONTENT['TEMPORARY_AREA_MAX_AGE'] (in
+        seconds) is used, defaulting to a day. Anything younger might belong
+        to someone who's still using the admin.
+        """
+        if max_age is None:
+            max_age = timedelta(seconds=get_app_settings().get(
+                'TEMPORARY_AREA_MAX_AGE', 24 * 60 * 60))
+        batch_size = batch_size or SWEEP_BATCH_SIZE
+        found = 0
+
+        stale = self.filter(created__lt=timezone.now() - max_age)
+        for pks in iter_pk_batches(stale, batch_size):
+            found += len(pks)
+            if not dry_run:
+                with transaction.commit_on_success(using=self.db):
+                    self.filter(pk__in=pks).delete()
+        return found
 
 
 class TemporaryArea(ContentArea):
@@ -237,6 +1034,11 @@ class TemporaryArea(ContentArea):
 
     created = models.DateTimeField(auto_now_add=True)
 
+    # These only ever hold half-finished admin edits.
+    use_snapshot = False
+
+    objects = TemporaryAreaManager()
+
     def migrate_items_to(self, real_area):
         """
         Take the items for this area and move them to the real area, then
@@ -250,8 +1052,10 @@ class TemporaryArea(ContentArea):
         }
 
         # Update the items for this temporary area.
-        self.items.update(**real_area_data)
+        BaseItem.objects.get_for_area(self).update(**real_area_data)
+        # Queryset updates skip BaseItem.save, so re-render the area ourselves.
+        area_changed(real_area_data['content_area_ct'],
+                     real_area_data['content_area_id'])
 
         # Delete the temporary area!
         self.delete()
-
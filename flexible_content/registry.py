@@ -0,0 +1,169 @@
+"""
+Keep track of the configured item types, so that the FLEXIBLE_CONTENT
+settings aren't re-parsed, and the models re-resolved, every time someone
+asks what types are available.
+
+The registry is built the first time it's needed and kept until settings
+change. Building it also loads each type's templates (including any
+overrides for particular kinds of area), so a missing or broken template
+(or two types sharing a slug) is reported as soon as the types are used,
+rather than when some page finally tries to render an item. Run
+`manage.py fc_check` to check the configuration without starting a server.
+"""
+
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.test.signals import setting_changed
+from django.utils.translation import ugettext as _
+
+from .rendering import get_item_template
+from .utils import get_app_settings, get_models_from_strings
+
+
+_item_types = None
+_item_types_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_item_types(sender, **kwargs):
+    global _item_types
+    with _item_types_lock:
+        _item_types = None
+
+
+class ItemType(object):
+    """
+    Everything we need to know about one configured item type.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        # An unsaved instance, for the admin's "add an item" controls.
+        self.instance = model()
+        self.slug = self.instance.get_type_slug()
+        self.name = self.instance.get_type_name()
+        self.description = self.instance.get_type_description()
+        self.content_type_id = ContentType.objects.get_for_model(model).pk
+        self.form_class = self.instance.get_form_class()
+        self.template_name = self.instance.get_template_name()
+
+        # Load the templates now, but hold on to the problem (if there is
+        # one) so it can be reported with any others.
+        self.template = None
+        self.template_error = None
+        self.template_error_names = None
+        for names in self.get_preload_template_names():
+            try:
+                template = get_item_template(names)
+            except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+                self.template_error = e
+                self.template_error_names = names
+                break
+            if self.template is None:
+                self.template = template
+
+    def get_preload_template_names(self):
+        """
+        Return the lists of templates an item of this type is rendered from:
+        one for an item on its own, then one for each kind of area, just as
+        the items' get_template_names() would give them. Those lists are
+        what compiled templates are kept by, so loading them here means the
+        first render in each kind of area doesn't have to.
+        """
+        from .models import ContentArea, get_concrete_subclasses
+
+        lists = [self.instance.get_template_names()]
+        for area_model in get_concrete_subclasses(ContentArea):
+            item = self.model()
+            item.content_area_ct_id = (ContentType.objects.
+                                       get_for_model(area_model).pk)
+            names = item.get_template_names()
+            if names not in lists:
+                lists.append(names)
+        return lists
+
+    def __repr__(self):
+        return '<ItemType: {}>'.format(self.slug)
+
+
+def resolve_configured_types():
+    """
+    Return a tuple of the item models named in the settings, or the default
+    types if there aren't any.
+    """
+
+    # Do the settings define classes?
+    configured_types = get_app_settings().get('ITEM_TYPES', None)
+
+    # If there are types chosen, import them.
+    if configured_types is not None:
+        configured_types = get_models_from_strings(configured_types)
+    # If not, grab the defaults.
+    else:
+        from .default_item_types.models import DEFAULT_TYPES
+        configured_types = DEFAULT_TYPES
+
+    return tuple(configured_types)
+
+
+def check_item_types(item_types):
+    """
+    Return a list of problems with the given ItemTypes.
+    """
+    errors = []
+
+    # Slugs pick templates and identify types in the admin, so they have to be
+    # unique.
+    models_by_slug = {}
+    for t in item_types:
+        if t.slug in models_by_slug:
+            errors.append(_("Item types {} and {} both use the type slug "
+                            "'{}'.".format(models_by_slug[t.slug].__name__,
+                                           t.model.__name__, t.slug)))
+        models_by_slug.setdefault(t.slug, t.model)
+
+    for t in item_types:
+        if isinstance(t.template_error, TemplateDoesNotExist):
+            errors.append(_("Item type {} needs a template named '{}', but "
+                            "it couldn't be found.".format(t.model.__name__,
+                                                           t.template_name)))
+        elif t.template_error is not None:
+            errors.append(_("Item type {}'s template (one of '{}') couldn't "
+                            "be loaded: {}".format(
+                                t.model.__name__,
+                                "', '".join(t.template_error_names),
+                                t.template_error)))
+
+    return errors
+
+
+def build_item_types():
+    """
+    Build the ItemTypes for the configured models, without any checks.
+    """
+    return tuple(ItemType(m) for m in resolve_configured_types())
+
+
+def get_item_types():
+    """
+    Return a tuple of ItemTypes for the configured types, building (and
+    checking) them the first time.
+    """
+    global _item_types
+    item_types = _item_types
+    if item_types is None:
+        with _item_types_lock:
+            item_types = _item_types
+            if item_types is None:
+                item_types = build_item_types()
+                errors = check_item_types(item_types)
+                if errors:
+                    message = _("django-flexible-content's item types are "
+                                "misconfigured:\n{}".format('\n'.join(errors)))
+                    raise ImproperlyConfigured(message)
+                _item_types = item_types
+    return item_types
@@ -0,0 +1,110 @@
+"""
+Find and compile item templates once per process, instead of searching the
+template loaders every time an item is rendered.
+
+For an item with the type slug 'plain-text' that belongs to a blog.BlogPost,
+these templates are tried, in order:
+    flexible-content/blog/blogpost/plain-text.html
+    flexible-content/plain-text.html
+so you can override how a type looks in one kind of area. Areas can also be
+rendered with a namespace (say, 'teaser'), which tries the same names under
+flexible-content/teaser/ first.
+
+Compiled templates are kept for the life of the process, unless DEBUG is on,
+in which case they're looked up fresh each time, so edits show up right away.
+Set FLEXIBLE_CONTENT['CACHE_TEMPLATES'] to override that.
+"""
+
+import os
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist, loader
+from django.template.loader import select_template
+from django.test.signals import setting_changed
+
+from .utils import get_app_settings
+
+
+TEMPLATE_NAME_TEMPLATE = 'flexible-content/{slug}.html'
+AREA_TEMPLATE_NAME_TEMPLATE = ('flexible-content/{app_label}/{model_name}/'
+                               '{slug}.html')
+
+# Compiled templates, by the tuple of names they were selected from.
+_templates = {}
+
+
+@receiver(setting_changed)
+def reset_templates(sender, setting, **kwargs):
+    if setting in ('DEBUG', 'FLEXIBLE_CONTENT', 'INSTALLED_APPS',
+                   'TEMPLATE_DIRS', 'TEMPLATE_LOADERS'):
+        _templates.clear()
+
+
+def template_cache_enabled():
+    return bool(get_app_settings().get('CACHE_TEMPLATES', not settings.DEBUG))
+
+
+def get_template_names(slug, area_model=None, namespace=None,
+                       template_name=None):
+    """
+    Return the names of the templates to try for a type, most specific first:
+    the override for the area model (if given), then `template_name`, which
+    defaults to flexible-content/<slug>.html. With a namespace, the same
+    names under flexible-content/<namespace>/ are tried before the usual
+    ones.
+    """
+    if template_name is None:
+        template_name = TEMPLATE_NAME_TEMPLATE.format(slug=slug)
+
+    names = []
+    if area_model is not None:
+        opts = area_model._meta
+        names.append(AREA_TEMPLATE_NAME_TEMPLATE.format(
+            app_label=opts.app_label,
+            model_name=opts.object_name.lower(),
+            slug=slug))
+    names.append(template_name)
+
+    if namespace:
+        prefix = 'flexible-content/'
+        names = ([prefix + namespace + '/' + n[len(prefix):] for n in names
+                  if n.startswith(prefix)] + names)
+    return names
+
+
+def get_item_template(template_names):
+    """
+    Return the first of the given templates that exists, compiled.
+    """
+    if not template_cache_enabled():
+        return select_template(template_names)
+
+    key = tuple(template_names)
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = select_template(template_names)
+    return template
+
+
+def get_template_mtime(template_name):
+    """
+    Return the modification time (a timestamp) of the file a template would
+    be loaded from, or None if it can't be found on disk.
+    """
+    # This sets up the loaders, if nothing's loaded a template yet.
+    try:
+        loader.find_template(template_name)
+    except TemplateDoesNotExist:
+        return None
+
+    for template_loader in loader.template_source_loaders or ():
+        # The cached loader wraps the loaders that actually find files.
+        for l in getattr(template_loader, 'loaders', [template_loader]):
+            get_sources = getattr(l, 'get_template_sources', None)
+            if get_sources is None:
+                continue
+            for path in get_sources(template_name):
+                if os.path.isfile(path):
+                    return os.path.getmtime(path)
+    return None
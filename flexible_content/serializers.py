@@ -0,0 +1,119 @@
+"""
+Turn areas and their items into plain dictionaries and lists, ready for
+json.dumps(), for frontends that would rather have data than HTML.
+
+An item is serialized as:
+    {
+        "id": 12,
+        "type": "plain-text",
+        "ordering": 3,
+        "modified": "2013-06-01T12:00:00Z",
+        "fields": {"text": "..."}
+    }
+
+"fields" holds the item type's own fields (not the ones every item has).
+File fields become their URLs. To change what a type sends, override
+get_serialized_fields() on it.
+"""
+
+import hashlib
+
+from django.db.models import Count, FileField, Max
+from django.db.models.fields.related import OneToOneField
+from django.utils.encoding import force_text
+
+from .cache import get_area_cache_version
+from .utils import JOINED_LOADING
+
+
+def get_item_fields(item):
+    """
+    Return the fields an item's type adds to BaseItem, in definition order.
+    """
+    from .models import BaseItem
+
+    base_fields = set(f.name for f in BaseItem._meta.fields)
+    fields = []
+    for field in item._meta.fields:
+        # Skip the shared fields and the link to each parent table.
+        if field.name in base_fields:
+            continue
+        if isinstance(field, OneToOneField) and field.rel.parent_link:
+            continue
+        fields.append(field)
+    return fields
+
+
+def get_field_value(item, field):
+    """
+    Return a field's value in a form json.dumps() (with Django's encoder)
+    can handle.
+    """
+    value = getattr(item, field.attname)
+    if isinstance(field, FileField):
+        return value.url if value else None
+    return value
+
+
+def serialize_item(item):
+    return {
+        'id': item.pk,
+        'type': item.get_type_slug(),
+        'ordering': item.ordering,
+        'modified': item.modified,
+        'fields': item.get_serialized_fields(),
+    }
+
+
+def serialize_area(area, items=None):
+    """
+    Serialize an area and its items, in order. The items come from the
+    area's snapshot if it has one (see snapshots.py), and are otherwise
+    loaded with one joined query, unless they're given (or were prefetched).
+    """
+    from .models import BaseItem
+
+    if items is None:
+        items = getattr(area, '_prefetched_items', None)
+    if items is None and area.get_snapshot() is not None:
+        serialized_items = area.get_snapshot().get_items()
+    else:
+        if items is None:
+            items = BaseItem.objects.get_for_area(area,
+                                                  loading=JOINED_LOADING)
+        serialized_items = [serialize_item(i) for i in items]
+    ct = area.get_content_type()
+    return {
+        'area': {
+            'type': '{}.{}'.format(ct.app_label, ct.model),
+            'id': area.pk,
+        },
+        'items': serialized_items,
+    }
+
+
+def get_area_version(area):
+    """
+    Describe the current state of an area's items cheaply, with one
+    aggregate query and without loading them.
+
+    Returns a tuple of (etag, last_modified). Any save changes the latest
+    modification time, and any delete changes the count, so the ETag changes
+    whenever the serialized items would. With the area cache on, the area's
+    cache version (see cache.py) goes in too, so anything that invalidates
+    the area changes its ETag as well. last_modified is None for an area
+    without items.
+    """
+    from .models import BaseItem
+
+    ct = area.get_content_type()
+    state = (BaseItem.objects.filter(content_area_ct=ct,
+                                     content_area_id=area.pk).
+             aggregate(count=Count('pk'), latest=Max('modified')))
+    latest = state['latest']
+    cache_version = get_area_cache_version(ct.pk, area.pk)
+    key = u'{}:{}:{}:{}:{}'.format(ct.pk, area.pk, state['count'],
+                                   latest.isoformat() if latest else '',
+                                   cache_version or '')
+    etag = hashlib.md5(force_text(key).encode('utf-8')).hexdigest()
+    return etag, latest
@@ -0,0 +1,110 @@
+"""
+Keep a snapshot of each area's serialized items and rendered content in one
+row of AreaSnapshot, so reading an area is a single indexed lookup instead of
+the item query (with all of its joins) and the template work.
+
+Enable it in your settings, then backfill the snapshots:
+    FLEXIBLE_CONTENT = {
+        'AREA_SNAPSHOTS': True,
+    }
+
+    python manage.py fc_rebuild_snapshots
+
+Whenever an area's items change, through the model API or the admin, its
+snapshot is rebuilt. Rebuilding reads all of the area's items, so it's only
+done once per area for each batch of changes:
+  - Inside deferred_rebuilds(), once at the end of the block, in the same
+    transaction. The admin saves this way.
+  - Inside invalidate_after_commit() (see cache.py), once at the end of the
+    block, after the transaction has committed. Until then, reads may see
+    the old snapshot.
+  - Otherwise, straight away, in the same transaction as the change.
+So wrap loops of changes in one of the blocks:
+    with deferred_rebuilds():
+        for item in items:
+            item.save()
+
+Until an area has a snapshot, it's rendered the usual way. Snapshots hold
+rendered HTML, so rebuild them after changing item templates.
+
+While the setting is off, snapshots aren't touched at all, so any left over
+from when it was on go stale as their areas change. After turning the
+setting back on, rebuild all of them (without --missing).
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+
+from .cache import invalidate_area, run_after_commit
+from .utils import get_app_settings
+
+
+_deferred = threading.local()
+
+
+def snapshots_enabled(area_model=None):
+    """
+    Should snapshots be kept (for the given ContentArea subclass)?
+    """
+    if not get_app_settings().get('AREA_SNAPSHOTS', False):
+        return False
+    return area_model is None or area_model.use_snapshot
+
+
+def area_changed(area_ct_id, area_id):
+    """
+    Note that an area's items changed: drop its cached content, and rebuild
+    its snapshot, either now or once the enclosing deferred_rebuilds() or
+    invalidate_after_commit() block is over.
+    """
+    invalidate_area(area_ct_id, area_id)
+    if not snapshots_enabled():
+        return
+
+    pending = getattr(_deferred, 'areas', None)
+    if pending is not None:
+        pending.add((area_ct_id, area_id))
+    elif not run_after_commit(('rebuild_area', area_ct_id, area_id),
+                              lambda: rebuild_area(area_ct_id, area_id)):
+        rebuild_area(area_ct_id, area_id)
+
+
+@contextmanager
+def deferred_rebuilds():
+    """
+    Collect the areas whose items change inside this block, and rebuild each
+    one's snapshot once at the end, rather than after every change. Nested
+    blocks leave the rebuilding to the outermost one.
+    """
+    if getattr(_deferred, 'areas', None) is not None:
+        yield
+        return
+
+    _deferred.areas = set()
+    try:
+        yield
+        areas = _deferred.areas
+    finally:
+        _deferred.areas = None
+    for area_ct_id, area_id in sorted(areas):
+        rebuild_area(area_ct_id, area_id)
+
+
+def rebuild_area(area_ct_id, area_id):
+    """
+    Rebuild the snapshot for the given area, or delete it if the area no
+    longer exists (or doesn't use snapshots). Returns the snapshot, if any.
+    """
+    from .models import AreaSnapshot
+
+    area_model = ContentType.objects.get_for_id(area_ct_id).model_class()
+    areas = []
+    if area_model is not None and snapshots_enabled(area_model):
+        areas = list(area_model._base_manager.filter(pk=area_id)[:1])
+    if not areas:
+        AreaSnapshot.objects.filter(content_area_ct=area_ct_id,
+                                    content_area_id=area_id).delete()
+        return None
+    return AreaSnapshot.objects.rebuild(areas[0])
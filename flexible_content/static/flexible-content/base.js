@@ -39,7 +39,7 @@
         }
 
         // What number item is this?
-        nextNumber = $('.fc-item').length + 1;
+        nextNumber = nextPrefixNumber();
 
         // Take the next number and insert it in the template.
         pattern = new RegExp(fcFormPrefixPlaceholder, 'gm')
@@ -53,6 +53,62 @@
         updateMetadata()
     }
 
+    /**
+     * Return a number that none of the items' prefixes use yet. Items that
+     * are loaded later might be numbered higher than the item count, so
+     * don't just count them.
+     */
+    function nextPrefixNumber() {
+        var highest = 0;
+        $('.fc-item').each(function() {
+            var number = parseInt($(this).attr('data-form-prefix')
+                                         .split('-').pop(), 10);
+            if (number > highest) {
+                highest = number;
+            }
+        });
+        return highest + 1;
+    }
+
+    /**
+     * Fetch the next page of this area's items and add them after the ones
+     * that have already been loaded (but before any new ones).
+     */
+    var loadingItems = false;
+    function loadMoreItems() {
+        var $nextOffset = $('input.fc-next-offset');
+        if (loadingItems || !fcItemFormsUrl || $nextOffset.val() === '') {
+            return;
+        }
+        loadingItems = true;
+
+        $.getJSON(fcItemFormsUrl, {
+            offset: $nextOffset.val(),
+            prefix_start: nextPrefixNumber()
+        }).done(function(data) {
+            var $existing = $('.fc-items .fc-item')
+                .has('input[name$="-pk"]').last();
+            if ($existing.length) {
+                $existing.after(data.html);
+            }
+            else {
+                $('.fc-items').prepend(data.html);
+            }
+
+            // Keep track of where to pick up next time.
+            if (data.next_offset === null) {
+                $nextOffset.val('');
+                $('.fc-load-more').hide();
+            }
+            else {
+                $nextOffset.val(data.next_offset);
+            }
+            updateMetadata();
+        }).always(function() {
+            loadingItems = false;
+        });
+    }
+
     /**
      * For a given element, find its ancestor element that represents the item.
      * @param {jQuery} $descendent  The element to find the item for.
@@ -125,6 +181,21 @@
             updateMetadata();
         });
 
+        // Load more items when they ask, or when they scroll near the end
+        // of the ones that are there.
+        $('.fc-load-more a').click(function(ev) {
+            ev.preventDefault();
+            loadMoreItems();
+        });
+        $(window).on('scroll.loadMore', function() {
+            var $items = $('.fc-items');
+            var itemsBottom = $items.offset().top + $items.outerHeight();
+            var windowBottom = $(window).scrollTop() + $(window).height();
+            if (itemsBottom - windowBottom < 500) {
+                loadMoreItems();
+            }
+        });
+
         // Adding new items. These don't need on, since they can't change
         // after the page has loaded.
         $('.fc-add-item .fc-item-types a').click(function(ev) {
@@ -0,0 +1,136 @@
+from django import template
+from django.utils import six
+from django.utils.translation import ugettext as _
+
+from flexible_content.models import prefetch_rendered_content
+
+
+register = template.Library()
+
+# The options {% flexible_content %} and {% prefetch_flexible_content %}
+# take, as keyword arguments.
+AREA_OPTIONS = ('types', 'limit', 'namespace')
+RENDER_OPTIONS = AREA_OPTIONS + ('timeout',)
+
+
+def parse_options(parser, bits, allowed):
+    """
+    Compile `name=value` arguments, checking that each one is allowed.
+    """
+    tag_name = bits[0]
+    options = {}
+    for bit in bits[2:]:
+        name, equals, value = bit.partition('=')
+        if not equals or name not in allowed:
+            message = _("'{}' doesn't understand {!r}. It takes these "
+                        "options: {}.".format(tag_name, bit,
+                                              ', '.join(allowed)))
+            raise template.TemplateSyntaxError(message)
+        if name in options:
+            message = _("'{}' was given {!r} twice.".format(tag_name, name))
+            raise template.TemplateSyntaxError(message)
+        options[name] = parser.compile_filter(value)
+    return options
+
+
+def resolve_options(options, context):
+    """
+    Resolve the compiled options, and tidy up their values: types can be a
+    list or a comma-separated string, and numbers can be strings.
+    """
+    resolved = {}
+    for name, value in options.items():
+        value = value.resolve(context)
+        if value is None or value == '':
+            continue
+        if name == 'types':
+            if isinstance(value, six.string_types):
+                value = value.split(',')
+            value = [t.strip() for t in value if t.strip()]
+        elif name in ('limit', 'timeout'):
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                message = _("{} should be a number, not "
+                            "{!r}.".format(name, value))
+                raise template.TemplateSyntaxError(message)
+        resolved[name] = value
+    return resolved
+
+
+class FlexibleContentNode(template.Node):
+    def __init__(self, area, options):
+        self.area = area
+        self.options = options
+
+    def render(self, context):
+        area = self.area.resolve(context)
+        # Render nothing for a missing area, like a missing variable would.
+        if area is None or area == '':
+            return ''
+        # The whole thing's needed at once anyway, so there's nothing to gain
+        # from streaming it, and this way it's cached.
+        return area.get_rendered_content(**resolve_options(self.options,
+                                                           context))
+
+
+class PrefetchFlexibleContentNode(template.Node):
+    def __init__(self, areas, options):
+        self.areas = areas
+        self.options = options
+
+    def render(self, context):
+        areas = self.areas.resolve(context)
+        if areas:
+            prefetch_rendered_content(areas,
+                                      **resolve_options(self.options,
+                                                        context))
+        return ''
+
+
+@register.tag
+def flexible_content(parser, token):
+    """
+    Render an area's content items:
+        {% load flexible_content_tags %}
+        {% flexible_content object %}
+
+    Options (each can be a variable):
+        timeout=300              cache it for this long (0: don't cache it)
+        types="plain-text,image" only render items of these types
+        limit=3                  only render the first few items
+        namespace="teaser"       look for item templates under
+                                 flexible-content/teaser/ first
+
+    See ContentArea.get_rendered_content.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        message = _("'{}' takes the content area, then any "
+                    "options.".format(bits[0]))
+        raise template.TemplateSyntaxError(message)
+    return FlexibleContentNode(parser.compile_filter(bits[1]),
+                               parse_options(parser, bits, RENDER_OPTIONS))
+
+
+@register.tag
+def prefetch_flexible_content(parser, token):
+    """
+    Get a list of areas ready to be rendered with {% flexible_content %},
+    looking them all up in the cache at once, and loading the items for the
+    ones that weren't cached in a single query:
+        {% prefetch_flexible_content posts limit=3 namespace="teaser" %}
+        {% for post in posts %}
+            {% flexible_content post limit=3 namespace="teaser" %}
+        {% endfor %}
+
+    Give it the same types, limit and namespace you'll render with.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        message = _("'{}' takes a list of content areas, then any "
+                    "options.".format(bits[0]))
+        raise template.TemplateSyntaxError(message)
+    return PrefetchFlexibleContentNode(parser.compile_filter(bits[1]),
+                                       parse_options(parser, bits,
+                                                     AREA_OPTIONS))
@@ -1,14 +1,37 @@
+import json
+from datetime import timedelta
+
 from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.urlresolvers import reverse
+from django.template import Context, Template, TemplateSyntaxError
 from django.contrib.admin.sites import AdminSite
 from django.contrib.contenttypes.models import ContentType
 from django.test import SimpleTestCase, TestCase
 from django.test.client import Client, RequestFactory
 from django.test.utils import override_settings
+from django.utils import timezone, translation
+from django.utils.html import escapejs
+from django.utils.six import StringIO
 
+from mock_project.test_app.admin import MyAreaAdmin
 from mock_project.test_app.models import MyArea, MyItem
 
 from .admin import ContentAreaAdmin, FORM_PREFIX_PLACEHOLDER, get_form_prefix
-from .models import BaseItem, ContentArea, TemporaryArea
+from .cache import (fragment_cache_stats, get_cache_backend,
+                    get_cached_area_content, get_fragment_cache_stats,
+                    invalidate_after_commit, invalidate_area,
+                    set_cached_area_content)
+from .instrumentation import (NULL_TIMER, get_collector, get_percentile,
+                              timed, timing_recorded)
+from .models import (AreaSnapshot, BaseItem, ContentArea, TemporaryArea,
+                     prefetch_rendered_content)
+from .registry import build_item_types, check_item_types, get_item_types
+from . import rendering
+from .rendering import get_item_template
+from .serializers import serialize_area
+from .snapshots import deferred_rebuilds
 from .default_item_types.models import (DEFAULT_TYPES, PlainText, RawHTML,
                                         Image, Download, Video)
 from .utils import get_app_settings, get_models_from_strings
@@ -158,6 +181,54 @@ class ConfiguredTypesTest(SimpleTestCase):
         self.assertEqual(types, CUSTOM_TYPES_CLASSES, "Configuration didn't "
                          "take our custom classes properly.")
 
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING})
+    def test_registry_built_once(self):
+        """
+        The registry should only be built once per configuration.
+        """
+        item_types = get_item_types()
+        self.assertIs(get_item_types(), item_types)
+        self.assertEqual([t.slug for t in item_types],
+                         ['plain-text', 'video', 'my-item'])
+        self.assertEqual(item_types[2].content_type_id,
+                         ContentType.objects.get_for_model(MyItem).pk)
+
+    @override_settings(FLEXIBLE_CONTENT=None)
+    def test_default_types_check_out(self):
+        """
+        Every default type should have a template and a unique slug.
+        """
+        self.assertEqual(check_item_types(build_item_types()), [])
+
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                         'CACHE_TEMPLATES': True})
+    def test_templates_preloaded(self):
+        """
+        Building the registry should compile the templates an item is
+        rendered from in each kind of area, not just the type's own.
+        """
+        item_type = build_item_types()[2]
+        item = MyItem(my_number=1)
+        item.content_area_ct_id = ContentType.objects.get_for_model(MyArea).pk
+        names = item.get_template_names()
+        self.assertIn(tuple(names), rendering._templates)
+        self.assertIs(get_item_template(names),
+                      rendering._templates[tuple(names)])
+        self.assertIs(item_type.template,
+                      get_item_template(MyItem().get_template_names()))
+
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': (
+        'default_item_types.PlainText', 'default_item_types.PlainText')})
+    def test_duplicate_slugs(self):
+        """
+        Two types with the same slug should be reported.
+        """
+        errors = check_item_types(build_item_types())
+        self.assertEqual(len(errors), 1)
+        self.assertIn('plain-text', errors[0])
+        with self.assertRaises(ImproperlyConfigured):
+            get_item_types()
+
 
 @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING})
 class AreaTest(TestCase):
@@ -230,6 +301,101 @@ class AreaTest(TestCase):
                       "Couldn't find second item's text ({}) in rendered "
                       "content.".format(self.item_a2.text))
 
+    def test_split_loading(self):
+        """
+        Split loading should give the same items, types, and order as the
+        default joined loading.
+        """
+        self.area_b.item_loading = 'split'
+        items = list(self.area_b.items)
+        expected = [self.item_b1, self.item_b2]
+
+        self.assertEqual(items, expected)
+        self.assertEqual([type(i) for i in items], [Video, RawHTML])
+
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                         'ITEM_LOADING': 'split'})
+    def test_split_loading_setting(self):
+        """
+        The project's settings should be able to turn on split loading.
+        """
+        items = list(BaseItem.objects.get_for_area(self.area_a))
+        self.assertEqual([type(i) for i in items], [MyItem, PlainText])
+
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_LOADING': 'sideways'})
+    def test_bad_loading_setting(self):
+        with self.assertRaises(ImproperlyConfigured):
+            BaseItem.objects.get_for_area(self.area_a)
+
+    def test_prefetch_items(self):
+        """
+        Prefetching should load every area's items in one query, after which
+        the areas shouldn't need to query at all.
+        """
+        with self.assertNumQueries(2):
+            areas = list(MyArea.objects.filter(
+                pk__in=[self.area_a.pk, self.area_b.pk]).
+                order_by('pk').prefetch_items())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(areas[0].get_items(),
+                             [self.item_a1, self.item_a2])
+            self.assertEqual(areas[1].get_items(),
+                             [self.item_b1, self.item_b2])
+            self.assertIn(self.item_a2.text, areas[0].get_rendered_content())
+
+    def test_prefetched_items_forgotten(self):
+        """
+        Prefetched items come back from get_items(), while items stays a
+        queryset. They're dropped when an item is saved through the area's
+        instance.
+        """
+        area = MyArea.objects.filter(pk=self.area_a.pk).prefetch_items()[0]
+        self.assertEqual(area.get_items(), [self.item_a1, self.item_a2])
+        self.assertEqual(area.items.count(), 2)
+
+        item = PlainText.objects.create(ordering=3, content_area=area,
+                                        text="Added")
+        self.assertEqual(area.items.filter(pk=item.pk).count(), 1)
+        self.assertEqual(area.get_items(),
+                         [self.item_a1, self.item_a2, item])
+        self.assertIn("Added", area.get_rendered_content())
+
+    def test_prefetch_items_loading(self):
+        """
+        Prefetching should load each area's items with its own strategy.
+        """
+        self.area_b.item_loading = 'split'
+        # One joined query for area A; for area B, one for the plain rows,
+        # then one per type.
+        with self.assertNumQueries(4):
+            areas = BaseItem.objects.prefetch_for_areas([self.area_a,
+                                                         self.area_b])
+        self.assertEqual([type(i) for i in areas[0]._prefetched_items],
+                         [MyItem, PlainText])
+        self.assertEqual([type(i) for i in areas[1]._prefetched_items],
+                         [Video, RawHTML])
+
+    def test_iter_rendered_content(self):
+        """
+        Streaming an area should give the same content, a piece at a time.
+        """
+        pieces = list(self.area_a.iter_rendered_content())
+
+        self.assertEqual(len(pieces), 2)
+        self.assertEqual(''.join(pieces),
+                         MyArea.objects.get(pk=self.area_a.pk).
+                         get_rendered_content())
+
+    def test_template_tag(self):
+        """
+        The template tag should render the area's content.
+        """
+        template = Template("{% load flexible_content_tags %}"
+                            "{% flexible_content area %}")
+        content = template.render(Context({'area': self.area_a}))
+        self.assertEqual(content, self.area_a.get_rendered_content())
+
     def test_items_deleted_with_area(self):
         """
         When we delete an area, its items should be cleared with it.
@@ -245,6 +411,676 @@ class AreaTest(TestCase):
         self.area_a.delete()
         self.assertEqual(BaseItem.objects.filter(pk__in=item_pks).count(), 0,
                          "We deleted an area, but its items remained.")
+        self.assertEqual(MyItem.objects.filter(pk__in=item_pks).count(), 0)
+        self.assertEqual(PlainText.objects.filter(pk__in=item_pks).count(), 0)
+
+        # The other area's items should be left alone.
+        self.assertEqual(len(self.area_b.items), 2)
+
+    def test_items_deleted_with_queryset(self):
+        """
+        Deleting areas in bulk (like the admin's delete action does) should
+        clear their items too, subclass rows and all.
+        """
+        MyArea.objects.filter(pk__in=[self.area_a.pk,
+                                      self.area_b.pk]).delete()
+        self.assertEqual(BaseItem.objects.count(), 0)
+        for model in (MyItem, PlainText, RawHTML, Video):
+            self.assertEqual(model.objects.count(), 0)
+
+
+@override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                     'CACHE_RENDERED_AREAS': True})
+class AreaCacheTest(TestCase):
+    """
+    Make sure rendered areas are cached, and re-rendered when items change.
+    """
+
+    def setUp(self):
+        get_cache_backend().clear()
+        self.area = MyArea.objects.create(title="Cached")
+        self.item = PlainText.objects.create(ordering=1,
+                                             content_area=self.area,
+                                             text="First version")
+
+    def test_cached_read(self):
+        """
+        Once an area's been rendered, a fresh instance shouldn't query for it.
+        """
+        expected = self.area.get_rendered_content()
+
+        area = MyArea.objects.get(pk=self.area.pk)
+        with self.assertNumQueries(0):
+            content = area.get_rendered_content()
+        self.assertEqual(content, expected)
+
+    def test_item_save_invalidates(self):
+        """
+        Saving an item should cause its area to be re-rendered.
+        """
+        self.area.get_rendered_content()
+
+        self.item.text = "Second version"
+        self.item.save()
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertIn("Second version", content)
+        self.assertNotIn("First version", content)
+
+    def test_moved_item_invalidates(self):
+        """
+        Moving an item out of an area should cause it to be re-rendered.
+        """
+        self.area.get_rendered_content()
+
+        other_area = MyArea.objects.create(title="Other")
+        item = PlainText.objects.get(pk=self.item.pk)
+        item.content_area = other_area
+        item.save()
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertNotIn("First version", content)
+
+    def test_item_delete_invalidates(self):
+        """
+        Deleting an item should cause its area to be re-rendered.
+        """
+        self.area.get_rendered_content()
+
+        self.item.delete()
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertNotIn("First version", content)
+
+    def test_invalidate_after_commit(self):
+        """
+        Content cached by a concurrent read before the commit, under the new
+        version, should be thrown away at the end of the block.
+        """
+        self.area.get_rendered_content()
+
+        with invalidate_after_commit():
+            self.item.text = "Second version"
+            self.item.save()
+            # A read that saw the old rows, racing the commit.
+            area = MyArea.objects.get(pk=self.area.pk)
+            content, version = get_cached_area_content(area)
+            set_cached_area_content(area, "First version", version)
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertIn("Second version", content)
+
+    def test_migrate_items_invalidates(self):
+        """
+        Items migrated from a temporary area should show up right away.
+        """
+        self.area.get_rendered_content()
+
+        temp_area = TemporaryArea.objects.create()
+        PlainText.objects.create(ordering=2, content_area=temp_area,
+                                 text="Migrated")
+        temp_area.migrate_items_to(self.area)
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertIn("Migrated", content)
+
+
+@override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                     'CACHE_RENDERED_AREAS': True})
+class TemplateTagTest(TestCase):
+    """
+    Make sure the template tag's options render (and cache) the right
+    variation of an area.
+    """
+
+    def setUp(self):
+        get_cache_backend().clear()
+        self.area = MyArea.objects.create(title="Tagged")
+        self.number = MyItem.objects.create(ordering=1,
+                                            content_area=self.area,
+                                            my_number=42)
+        self.text = PlainText.objects.create(ordering=2,
+                                             content_area=self.area,
+                                             text="Some text")
+        self.other_area = MyArea.objects.create(title="Other")
+        PlainText.objects.create(ordering=1, content_area=self.other_area,
+                                 text="Other text")
+
+    def render(self, tag, **context):
+        template = Template("{% load flexible_content_tags %}" + tag)
+        return template.render(Context(context))
+
+    def test_types(self):
+        """
+        Only items of the given types should be rendered.
+        """
+        content = self.render('{% flexible_content area types="plain-text" %}',
+                              area=self.area)
+        self.assertIn("Some text", content)
+        self.assertNotIn("42", content)
+
+        # A list in the context should do just as well.
+        content = self.render('{% flexible_content area types=types %}',
+                              area=self.area, types=['my-item'])
+        self.assertIn("42", content)
+        self.assertNotIn("Some text", content)
+
+    def test_limit(self):
+        """
+        Only the first few items should be rendered.
+        """
+        content = self.render('{% flexible_content area limit=1 %}',
+                              area=self.area)
+        self.assertIn("42", content)
+        self.assertNotIn("Some text", content)
+
+    def test_namespace(self):
+        """
+        A namespace's templates should be used where they exist, and the
+        usual ones otherwise.
+        """
+        content = self.render(
+            '{% flexible_content area namespace="teaser" %}', area=self.area)
+        self.assertIn("Teaser number 42.", content)
+        self.assertIn("Some text", content)
+
+    def test_variants_cached_and_invalidated(self):
+        """
+        Each variation should be cached separately, and all of them should
+        be re-rendered when an item changes.
+        """
+        tag = '{% flexible_content area limit=2 types="plain-text" %}'
+        full = self.area.get_rendered_content()
+        self.render(tag, area=self.area)
+
+        area = MyArea.objects.get(pk=self.area.pk)
+        with self.assertNumQueries(0):
+            self.assertIn("Some text", self.render(tag, area=area))
+            self.assertEqual(area.get_rendered_content(), full)
+
+        self.text.text = "Changed text"
+        self.text.save()
+
+        area = MyArea.objects.get(pk=self.area.pk)
+        self.assertIn("Changed text", self.render(tag, area=area))
+        self.assertIn("Changed text", area.get_rendered_content())
+
+    def test_timeout_zero_skips_cache(self):
+        """
+        timeout=0 should render the area every time.
+        """
+        tag = '{% flexible_content area limit=1 timeout=0 %}'
+        self.render(tag, area=self.area)
+
+        area = MyArea.objects.get(pk=self.area.pk)
+        with self.assertNumQueries(1):
+            self.render(tag, area=area)
+
+    def test_prefetch(self):
+        """
+        Prefetching should fetch the items of every uncached area at once,
+        and then rendering them shouldn't query at all.
+        """
+        tag = ('{% prefetch_flexible_content areas limit=1 %}'
+               '{% for area in areas %}'
+               '{% flexible_content area limit=1 %}|'
+               '{% endfor %}')
+        # Cache the first area, but not the other one.
+        MyArea.objects.get(pk=self.area.pk).get_rendered_content(limit=1)
+
+        areas = list(MyArea.objects.filter(pk__in=[self.area.pk,
+                                                   self.other_area.pk]).
+                     order_by('pk'))
+        with self.assertNumQueries(1):
+            template = Template("{% load flexible_content_tags %}" + tag)
+            content = template.render(Context({'areas': areas}))
+        self.assertEqual(content.split('|')[:2],
+                         [self.area.get_rendered_content(limit=1),
+                          self.other_area.get_rendered_content(limit=1)])
+
+    def test_prefetch_without_options(self):
+        """
+        Prefetched areas rendered without options shouldn't go back to the
+        cache one at a time, whether with the tag or by streaming.
+        """
+        MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        MyArea.objects.get(pk=self.other_area.pk).get_rendered_content()
+        areas = list(MyArea.objects.filter(pk__in=[self.area.pk,
+                                                   self.other_area.pk]).
+                     order_by('pk'))
+
+        backend = get_cache_backend()
+        lookups = []
+        get_many = backend.get_many
+        backend.get_many = lambda keys, **kwargs: (
+            lookups.append(keys) or get_many(keys, **kwargs))
+        try:
+            with self.assertNumQueries(0):
+                content = self.render(
+                    '{% prefetch_flexible_content areas %}'
+                    '{% for area in areas %}'
+                    '{% flexible_content area %}|'
+                    '{% endfor %}', areas=areas)
+            self.assertEqual(len(lookups), 1)
+            self.assertIn("Some text", content.split('|')[0])
+            self.assertIn("Other text", content.split('|')[1])
+
+            areas = prefetch_rendered_content(
+                MyArea.objects.filter(pk=self.area.pk))
+            content = ''.join(areas[0].iter_rendered_content())
+            self.assertIn("Some text", content)
+            self.assertEqual(len(lookups), 2)
+        finally:
+            del backend.get_many
+
+    def test_bad_options(self):
+        """
+        Unknown or repeated options should be caught when the template is
+        compiled.
+        """
+        for tag in ('{% flexible_content %}',
+                    '{% flexible_content area colour="red" %}',
+                    '{% flexible_content area limit %}',
+                    '{% flexible_content area limit=1 limit=2 %}',
+                    '{% prefetch_flexible_content areas timeout=5 %}'):
+            with self.assertRaises(TemplateSyntaxError):
+                Template("{% load flexible_content_tags %}" + tag)
+
+
+@override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                     'CACHE_RENDERED_ITEMS': True})
+class FragmentCacheTest(TestCase):
+    """
+    Make sure item fragments are cached, and only changed items re-render.
+    """
+
+    def setUp(self):
+        get_cache_backend().clear()
+        fragment_cache_stats.reset()
+        self.area = MyArea.objects.create(title="Fragments")
+        self.item_1 = PlainText.objects.create(ordering=1,
+                                               content_area=self.area,
+                                               text="Unchanged")
+        self.item_2 = PlainText.objects.create(ordering=2,
+                                               content_area=self.area,
+                                               text="Before")
+
+    def test_only_changed_items_rerender(self):
+        """
+        After one item is edited, the other should come from the cache.
+        """
+        self.area.get_rendered_content()
+        self.assertEqual(get_fragment_cache_stats()['misses'], 2)
+
+        self.item_2.text = "After"
+        self.item_2.save()
+
+        content = MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        self.assertIn("Unchanged", content)
+        self.assertIn("After", content)
+
+        stats = get_fragment_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['hit_ratio'], 0.25)
+
+    def test_single_item(self):
+        """
+        Rendering a single item should use the cache too.
+        """
+        self.item_1.get_rendered_content()
+        PlainText.objects.get(pk=self.item_1.pk).get_rendered_content()
+
+        stats = get_fragment_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+
+class SweepTest(TestCase):
+    """
+    Make sure leftover temporary areas and orphaned items get cleaned up, and
+    nothing else does.
+    """
+
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Still here")
+        self.item = PlainText.objects.create(content_area=self.area,
+                                             text="Keep me.")
+
+        # An abandoned temporary area, and one that's still in use.
+        self.stale_area = TemporaryArea.objects.create()
+        self.stale_item = PlainText.objects.create(
+            content_area=self.stale_area, text="Abandoned.")
+        TemporaryArea.objects.filter(pk=self.stale_area.pk).update(
+            created=timezone.now() - timedelta(days=2))
+        self.fresh_area = TemporaryArea.objects.create()
+
+        # An item whose area is long gone.
+        self.orphan = RawHTML.objects.create(
+            content_area_ct=self.area.get_content_type(),
+            content_area_id=self.area.pk + 1000, html="<p>Orphan</p>")
+
+    def test_sweep_temporary_areas(self):
+        self.assertEqual(TemporaryArea.objects.sweep(batch_size=1), 1)
+        self.assertEqual(list(TemporaryArea.objects.values_list('pk',
+                                                                flat=True)),
+                         [self.fresh_area.pk])
+        self.assertFalse(BaseItem.objects.filter(
+            pk=self.stale_item.pk).exists())
+
+    def test_sweep_orphans(self):
+        self.assertEqual(BaseItem.objects.sweep_orphans(batch_size=1), 1)
+        self.assertFalse(BaseItem.objects.filter(pk=self.orphan.pk).exists())
+        self.assertTrue(BaseItem.objects.filter(pk=self.item.pk).exists())
+        self.assertTrue(BaseItem.objects.filter(
+            pk=self.stale_item.pk).exists())
+
+    def test_uninstalled_area_model(self):
+        """
+        Items of an area model that isn't installed should only be swept
+        when that's asked for.
+        """
+        gone_ct = ContentType.objects.create(name="gone", app_label='gone',
+                                             model='gonearea')
+        item = PlainText.objects.create(content_area_ct=gone_ct,
+                                        content_area_id=1, text="Gone?")
+        self.assertEqual(BaseItem.objects.sweep_orphans(), 1)
+        self.assertTrue(BaseItem.objects.filter(pk=item.pk).exists())
+
+        call_command('fc_sweep', include_uninstalled=True, verbosity=0)
+        self.assertFalse(BaseItem.objects.filter(pk=item.pk).exists())
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command('fc_sweep', dry_run=True, stdout=out)
+        self.assertIn("Would delete 1 temporary area(s) and 1 orphaned "
+                      "item(s).", out.getvalue())
+        self.assertEqual(TemporaryArea.objects.count(), 2)
+        self.assertEqual(BaseItem.objects.count(), 3)
+
+    def test_command(self):
+        call_command('fc_sweep', verbosity=0)
+        self.assertEqual(TemporaryArea.objects.count(), 1)
+        self.assertEqual(list(BaseItem.objects.values_list('pk', flat=True)),
+                         [self.item.pk])
+
+
+class ApiTest(TestCase):
+    """
+    Check the JSON API, and that unchanged areas aren't serialized again.
+    """
+
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Blah")
+        self.item_2 = PlainText.objects.create(ordering=2,
+                                               content_area=self.area,
+                                               text="Second")
+        self.item_1 = MyItem.objects.create(ordering=1,
+                                            content_area=self.area,
+                                            my_number=81)
+        self.url = reverse('flexible-content-area-items',
+                           args=['test_app', 'myarea', self.area.pk])
+        self.client = Client()
+
+    def test_items(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['area'], {'type': 'test_app.myarea',
+                                        'id': self.area.pk})
+        self.assertEqual([i['id'] for i in data['items']],
+                         [self.item_1.pk, self.item_2.pk])
+        self.assertEqual(data['items'][0]['type'], 'my-item')
+        self.assertEqual(data['items'][0]['fields'], {'my_number': 81})
+        self.assertEqual(data['items'][1]['type'], 'plain-text')
+        self.assertEqual(data['items'][1]['fields'], {'text': "Second"})
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        # Just the area and the aggregate; no items are loaded.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Saving or deleting an item changes the ETag.
+        self.item_2.text = "Changed"
+        self.item_2.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.item_1.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(
+            response.content.decode('utf-8'))['items']), 1)
+
+    @override_settings(FLEXIBLE_CONTENT={'CACHE_RENDERED_AREAS': True})
+    def test_invalidated(self):
+        """
+        With the area cache on, invalidating an area should change its ETag,
+        even if its items look the same.
+        """
+        etag = self.client.get(self.url)['ETag']
+        invalidate_area(self.area.get_content_type().pk, self.area.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_found(self):
+        temp_area = TemporaryArea.objects.create()
+        for args in (['test_app', 'myarea', self.area.pk + 1],
+                     ['test_app', 'myitem', self.item_1.pk],
+                     ['flexible_content', 'temporaryarea', temp_area.pk]):
+            url = reverse('flexible-content-area-items', args=args)
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_opt_in(self):
+        """
+        Areas should only be served if their model opts in, and only the
+        ones its get_api_queryset() returns.
+        """
+        MyArea.api_visible = False
+        try:
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+        finally:
+            MyArea.api_visible = True
+
+        MyArea.get_api_queryset = classmethod(
+            lambda cls, request: cls.objects.exclude(title="Blah"))
+        try:
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+        finally:
+            del MyArea.get_api_queryset
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(FLEXIBLE_CONTENT={'AREA_SNAPSHOTS': True})
+class SnapshotTest(TestCase):
+    """
+    Make sure snapshots are kept up to date, and used for reads.
+    """
+
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Blah")
+        self.item_1 = PlainText.objects.create(ordering=1,
+                                               content_area=self.area,
+                                               text="First")
+        self.item_2 = MyItem.objects.create(ordering=2,
+                                            content_area=self.area,
+                                            my_number=81)
+
+    def get_snapshot(self):
+        return AreaSnapshot.objects.get_for_area(self.area)
+
+    def test_kept_up_to_date(self):
+        snapshot = self.get_snapshot()
+        self.assertEqual([i['id'] for i in snapshot.get_items()],
+                         [self.item_1.pk, self.item_2.pk])
+        self.assertIn("First", snapshot.rendered_content)
+
+        self.item_1.text = "Changed"
+        self.item_1.save()
+        self.assertIn("Changed", self.get_snapshot().rendered_content)
+        self.item_1.delete()
+        self.assertEqual(len(self.get_snapshot().get_items()), 1)
+
+        self.area.delete()
+        self.assertEqual(AreaSnapshot.objects.count(), 0)
+
+    def test_reads(self):
+        area = MyArea.objects.get(pk=self.area.pk)
+        with self.assertNumQueries(1):
+            content = area.get_rendered_content()
+        self.assertEqual(content, self.get_snapshot().rendered_content)
+
+        area = MyArea.objects.get(pk=self.area.pk)
+        with self.assertNumQueries(1):
+            data = serialize_area(area)
+        self.assertEqual([i['type'] for i in data['items']],
+                         ['plain-text', 'my-item'])
+
+    def test_deferred_rebuilds(self):
+        with deferred_rebuilds():
+            self.item_1.text = "Changed"
+            self.item_1.save()
+            self.assertIn("First", self.get_snapshot().rendered_content)
+        self.assertIn("Changed", self.get_snapshot().rendered_content)
+
+    def test_bulk_reorder(self):
+        """
+        Reordering items in bulk should update their area's snapshot.
+        """
+        BaseItem.objects.bulk_reorder({self.item_1.pk: 3})
+        self.assertEqual([i['id'] for i in self.get_snapshot().get_items()],
+                         [self.item_2.pk, self.item_1.pk])
+
+    def test_moved_item(self):
+        """
+        Moving an item to another area should update both snapshots.
+        """
+        other_area = MyArea.objects.create(title="Other")
+        item = PlainText.objects.get(pk=self.item_1.pk)
+        item.content_area = other_area
+        item.save()
+        self.assertEqual([i['id'] for i in self.get_snapshot().get_items()],
+                         [self.item_2.pk])
+        self.assertEqual([i['id'] for i in AreaSnapshot.objects.
+                          get_for_area(other_area).get_items()],
+                         [self.item_1.pk])
+
+    def test_rebuilt_after_commit(self):
+        """
+        Inside invalidate_after_commit(), an area's snapshot should be
+        rebuilt once, at the end of the block.
+        """
+        with invalidate_after_commit():
+            for text in ("Changed", "Changed again"):
+                self.item_1.text = text
+                self.item_1.save()
+            self.assertIn("First", self.get_snapshot().rendered_content)
+        self.assertIn("Changed again", self.get_snapshot().rendered_content)
+
+    def test_left_alone_while_disabled(self):
+        """
+        While snapshots are off, changing an area shouldn't touch its
+        snapshot, or be rendered from it.
+        """
+        with self.settings(FLEXIBLE_CONTENT={}):
+            self.item_1.text = "Changed"
+            self.item_1.save()
+            area = MyArea.objects.get(pk=self.area.pk)
+            self.assertIn("Changed", area.get_rendered_content())
+        self.assertIn("First", self.get_snapshot().rendered_content)
+
+    def test_temporary_areas(self):
+        temp_area = TemporaryArea.objects.create()
+        PlainText.objects.create(content_area=temp_area, text="Temporary")
+        self.assertIsNone(AreaSnapshot.objects.get_for_area(temp_area))
+
+    def test_command(self):
+        other_area = MyArea.objects.create(title="Other")
+        AreaSnapshot.objects.all().delete()
+        out = StringIO()
+        call_command('fc_rebuild_snapshots', batch_size=1, stdout=out)
+        self.assertIn("Rebuilt 2 snapshot(s).", out.getvalue())
+        self.assertEqual(self.get_snapshot().get_items()[0]['id'],
+                         self.item_1.pk)
+        self.assertEqual(AreaSnapshot.objects.get_for_area(
+            other_area).get_items(), [])
+
+        AreaSnapshot.objects.filter(content_area_id=other_area.pk).delete()
+        out = StringIO()
+        call_command('fc_rebuild_snapshots', missing=True, stdout=out)
+        self.assertIn("Rebuilt 1 snapshot(s).", out.getvalue())
+
+        with self.settings(FLEXIBLE_CONTENT={}):
+            self.assertRaises(CommandError, call_command,
+                              'fc_rebuild_snapshots')
+
+
+@override_settings(FLEXIBLE_CONTENT={'INSTRUMENTATION': True})
+class InstrumentationTest(TestCase):
+    """
+    Make sure the hot paths are timed when (and only when) asked.
+    """
+
+    def setUp(self):
+        self.area = MyArea.objects.create(title="Blah")
+        PlainText.objects.create(ordering=1, content_area=self.area,
+                                 text="First")
+        PlainText.objects.create(ordering=2, content_area=self.area,
+                                 text="Second")
+        MyItem.objects.create(ordering=3, content_area=self.area,
+                              my_number=81)
+        self.timings = []
+        timing_recorded.connect(self.receive_timing)
+
+    def tearDown(self):
+        timing_recorded.disconnect(self.receive_timing)
+
+    def receive_timing(self, sender, timing, **kwargs):
+        self.timings.append(timing)
+
+    def test_render(self):
+        MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+        summary = get_collector().get_summary()
+
+        area_timing = [t for t in self.timings
+                       if t.operation == 'area.render'][0]
+        self.assertEqual(area_timing.extra['source'], 'render')
+        self.assertEqual(area_timing.type_counts,
+                         {'plain-text': 2, 'my-item': 1})
+        self.assertEqual(summary['operations']['items.load']['items'], 3)
+        self.assertEqual(summary['operations']['item.render']['count'], 3)
+        self.assertEqual(summary['item_types']['plain-text']['count'], 2)
+        self.assertEqual(
+            sorted(get_collector().get_render_percentiles('my-item')),
+            [50, 90, 99])
+
+    def test_admin(self):
+        admin = ContentAreaAdmin(MyArea, AdminSite())
+        request = RequestFactory().get('/admin/test_app/myarea/{}/'.
+                                       format(self.area.pk))
+        admin.fc_get_forms(request, obj=self.area)
+        timing = self.timings[-1]
+        self.assertEqual(timing.operation, 'admin.get_forms')
+        self.assertEqual(timing.item_count, 3)
+
+    def test_disabled(self):
+        with self.settings(FLEXIBLE_CONTENT={}):
+            self.assertIs(timed('area.render'), NULL_TIMER)
+            MyArea.objects.get(pk=self.area.pk).get_rendered_content()
+            self.assertEqual(self.timings, [])
+
+    def test_percentiles(self):
+        values = [0.1 * n for n in range(1, 11)]
+        self.assertEqual(get_percentile(values, 50), values[4])
+        self.assertEqual(get_percentile(values, 90), values[8])
+        self.assertEqual(get_percentile(values, 99), values[9])
+        self.assertIsNone(get_percentile([], 50))
 
 
 @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING})
@@ -289,6 +1125,37 @@ class ItemTest(TestDataMixin, TestCase):
                             "We asked for the casted version of an item, but "
                             "we still got a BaseItem back.")
 
+    def test_get_casted_one_query(self):
+        """
+        Casting an item whose type was recorded should take a single query.
+        """
+        item = BaseItem.objects.get(pk=self.item_2.pk)
+        with self.assertNumQueries(1):
+            casted_item = item.get_casted()
+        self.assertEqual(type(casted_item), Video)
+
+    def test_item_type_recorded(self):
+        """
+        Saving an item should record its concrete type.
+        """
+        item = MyItem.objects.create(content_area=self.area, my_number=5)
+        base_item = BaseItem.objects.get(pk=item.pk)
+        self.assertEqual(base_item.item_ct,
+                         ContentType.objects.get_for_model(MyItem))
+
+    def test_backfill_item_types(self):
+        """
+        Items without a recorded type should get one from the backfill.
+        """
+        BaseItem.objects.update(item_ct=None)
+
+        updated = BaseItem.objects.backfill_item_types()
+
+        self.assertEqual(updated, 2)
+        self.assertEqual(BaseItem.objects.get(pk=1).get_item_model(),
+                         PlainText)
+        self.assertEqual(BaseItem.objects.get(pk=2).get_item_model(), Video)
+
     def test_get_type_description(self):
         """
         Make sure that we can get a type's description.
@@ -354,6 +1221,14 @@ class ItemTest(TestDataMixin, TestCase):
             self.fail("Couldn't create a video by saving faked data through "
                       "a form.")
 
+    def test_auto_form_class_reused(self):
+        """
+        Generated form classes should be built once per model.
+        """
+        form_class = MyItem().get_form_class()
+        self.assertIs(MyItem().get_form_class(), form_class)
+        self.assertIsNot(PlainText().get_form_class(), form_class)
+
     def test_get_instance_form(self):
         """
         Can we get the form for an existing content item?
@@ -413,6 +1288,45 @@ class ItemTest(TestDataMixin, TestCase):
                          'flexible-content/video.html',
                          "We didn't get the template name we expected.")
 
+    def test_area_template_override(self):
+        """
+        Items should use their area model's template, if one exists.
+        """
+        item = MyItem.objects.create(content_area=self.area, my_number=12)
+        self.assertEqual(item.get_rendered_content().strip(),
+                         "In this area, your number is 12!")
+
+        temp_area = TemporaryArea.objects.create()
+        item = MyItem.objects.create(content_area=temp_area, my_number=12)
+        self.assertEqual(item.get_rendered_content().strip(),
+                         "Your number is 12!")
+
+    def test_overridden_template_name(self):
+        """
+        A type that overrides get_template_name() should render with that
+        template, after any override for its area.
+        """
+        item = PlainText(content_area=TemporaryArea.objects.create(),
+                         text="Plain")
+        item.get_template_name = lambda: 'flexible-content/my-item.html'
+        self.assertEqual(item.get_template_names()[-1],
+                         'flexible-content/my-item.html')
+        self.assertEqual(item.render_content().strip(), "Your number is !")
+
+        item.content_area = self.area
+        self.assertEqual(item.get_template_names(),
+                         ['flexible-content/test_app/myarea/plain-text.html',
+                          'flexible-content/my-item.html'])
+
+    @override_settings(FLEXIBLE_CONTENT={'ITEM_TYPES': CUSTOM_TYPES_STRING,
+                                         'CACHE_TEMPLATES': True})
+    def test_template_registry(self):
+        """
+        Templates should only be compiled once when the registry is on.
+        """
+        names = self.item_1.get_template_names()
+        self.assertIs(get_item_template(names), get_item_template(names))
+
     def test_delete_base_item(self):
         """
         Ensure that the subclass is deleted too, for generic FK integrity.
@@ -550,6 +1464,57 @@ class AdminUnitTest(TestDataMixin, TestCase):
         self.assertEqual(forms[3].data['fc-item-4-text'],
                          data['fc-item-4-text'])
 
+    def test_fc_get_forms_from_POST_queries(self):
+        """
+        Existing items should be loaded in a single query, and content types
+        should come from ContentType's cache.
+        """
+        url = '/admin/test_app/myarea/{}'.format(self.area.pk)
+        data = self.data_for_updating_first_area
+        request = self.factory.post(url, data)
+
+        # Warm ContentType's cache, like any previous request would have.
+        for key, value in data.items():
+            if key.endswith('-ct'):
+                ContentType.objects.get_for_id(value)
+
+        with self.assertNumQueries(1):
+            forms = self.admin.fc_get_forms_from_POST(request)
+
+        self.assertEqual(forms[0].instance, self.item_1)
+        self.assertEqual(forms[1].instance, self.item_2)
+        self.assertEqual(type(forms[2].instance), RawHTML)
+
+    def test_fc_get_forms_from_POST_missing_item(self):
+        """
+        Submitting a primary key that doesn't exist should still complain.
+        """
+        data = dict(self.data_for_updating_first_area, **{'fc-item-1-pk': 999})
+        request = self.factory.post('/admin/test_app/myarea/1/', data)
+
+        with self.assertRaises(ValueError):
+            self.admin.fc_get_forms_from_POST(request)
+
+    def test_fc_get_forms_from_POST_similar_prefixes(self):
+        """
+        Items 1 and 10 shouldn't get each other's data.
+        """
+        plain_text_ct = ContentType.objects.get_for_model(PlainText).pk
+        data = {
+            'fc-prefixes': 'fc-item-1,fc-item-10',
+            'fc-item-1-ct': plain_text_ct,
+            'fc-item-1-text': "One",
+            'fc-item-10-ct': plain_text_ct,
+            'fc-item-10-text': "Ten",
+        }
+        request = self.factory.post('/admin/test_app/myarea/add/', data)
+
+        forms = self.admin.fc_get_forms_from_POST(request)
+
+        self.assertEqual(sorted(forms[0].data.keys()),
+                         ['fc-item-1-ct', 'fc-item-1-text'])
+        self.assertEqual(forms[1].data['fc-item-10-text'], "Ten")
+
     def test_fc_get_forms_GET_add(self):
         self.fail("You haven't finished this test yet.")
 
@@ -574,6 +1539,144 @@ class AdminUnitTest(TestDataMixin, TestCase):
         # Are there any existing items that weren't found in the forms?
         self.assertEqual(len(existing_item_pks), 0)
 
+    def test_fc_get_forms_GET_change_paged(self):
+        """
+        Only the first page of items should be loaded with the change page.
+        """
+        self.admin.fc_items_per_page = 1
+        request = self.factory.get('/admin/test_app/myarea/{}/'.
+                                   format(self.area.pk))
+
+        forms = self.admin.fc_get_forms(request, obj=self.area)
+        self.assertEqual([f.instance.pk for f in forms], [1])
+        self.assertEqual(self.admin.fc_get_next_offset(request, self.area), 1)
+
+        # The next page should pick up where that left off, with prefixes
+        # that don't clash.
+        forms, next_offset = self.admin.fc_get_item_forms_page(
+            self.area, offset=1, prefix_start=5)
+        self.assertEqual([f.instance.pk for f in forms], [2])
+        self.assertEqual(forms[0].prefix, get_form_prefix(5))
+        self.assertEqual(next_offset, None)
+
+    def test_fc_save_items_partial(self):
+        """
+        Items that weren't loaded should be left alone, other than being moved
+        down to make room for the ones that were.
+        """
+        url = '/admin/test_app/myarea/{}/'.format(self.area.pk)
+        data = {
+            'title': "Our original area, partly loaded",
+            'fc-prefixes': 'fc-item-1,fc-item-2',
+            # Only item 1 was loaded; item 2 (a video) wasn't.
+            'fc-next-offset': 1,
+            'fc-item-1-pk': 1,
+            'fc-item-1-ct': ContentType.objects.get_for_model(PlainText).pk,
+            'fc-item-1-ordering': 1,
+            'fc-item-1-delete': 0,
+            'fc-item-1-text': "Updated.",
+            # Add one after it, which will need the video's spot.
+            'fc-item-2-ct': ContentType.objects.get_for_model(RawHTML).pk,
+            'fc-item-2-ordering': 2,
+            'fc-item-2-delete': 0,
+            'fc-item-2-html': "<p>New!</p>",
+        }
+        request = self.factory.post(url, data)
+
+        forms = self.admin.fc_get_forms(request, obj=self.area)
+        self.admin.fc_save_items(request, area=self.area, forms=forms)
+
+        items = list(self.area.items)
+        self.assertEqual([type(i) for i in items], [PlainText, RawHTML, Video])
+        self.assertEqual([i.ordering for i in items], [1, 2, 3])
+        self.assertEqual(items[0].text, "Updated.")
+        self.assertEqual(items[2].video_id, self.item_2.video_id)
+
+    def test_fc_save_items_partial_invalid(self):
+        """
+        If the items that were loaded don't validate, the ones that weren't
+        shouldn't be moved, and nothing else should be saved either.
+        """
+        url = '/admin/test_app/myarea/{}/'.format(self.area.pk)
+        data = {
+            'title': "Our original area, partly loaded",
+            'fc-prefixes': 'fc-item-1,fc-item-2',
+            'fc-next-offset': 1,
+            'fc-item-1-pk': 1,
+            'fc-item-1-ct': ContentType.objects.get_for_model(PlainText).pk,
+            'fc-item-1-ordering': 1,
+            'fc-item-1-delete': 0,
+            'fc-item-1-text': "Updated.",
+            # This one's missing its HTML.
+            'fc-item-2-ct': ContentType.objects.get_for_model(RawHTML).pk,
+            'fc-item-2-ordering': 2,
+            'fc-item-2-delete': 0,
+            'fc-item-2-html': "",
+        }
+        request = self.factory.post(url, data)
+
+        forms = self.admin.fc_get_forms(request, obj=self.area)
+        self.admin.fc_save_items(request, area=self.area, forms=forms)
+
+        self.assertEqual(request.POST['all_items_validated'], '0')
+        items = list(self.area.items)
+        self.assertEqual([type(i) for i in items], [PlainText, Video])
+        self.assertEqual([i.ordering for i in items], [1, 2])
+        self.assertEqual(items[0].text, self.item_1.text)
+
+    def test_fc_save_items_unchanged(self):
+        """
+        Items that come back just as they were rendered shouldn't be
+        validated or saved again.
+        """
+        get_request = self.factory.get('/admin/test_app/myarea/{}/'.
+                                       format(self.area.pk))
+        plain_text_form, video_form = self.admin.fc_get_forms(get_request,
+                                                              obj=self.area)
+        video_modified = self.item_2.modified
+
+        url = '/admin/test_app/myarea/{}/'.format(self.area.pk)
+        data = {
+            'title': "Our original area, with one item edited",
+            'fc-prefixes': 'fc-item-1,fc-item-2',
+            'fc-item-1-pk': 1,
+            'fc-item-1-ct': ContentType.objects.get_for_model(PlainText).pk,
+            'fc-item-1-fingerprint': plain_text_form.get_fingerprint(),
+            'fc-item-1-ordering': 1,
+            'fc-item-1-delete': 0,
+            'fc-item-1-text': "Edited.",
+            # Validating a video would look it up online, so if this works
+            # without network access, it was skipped.
+            'fc-item-2-pk': 2,
+            'fc-item-2-ct': ContentType.objects.get_for_model(Video).pk,
+            'fc-item-2-fingerprint': video_form.get_fingerprint(),
+            'fc-item-2-ordering': 2,
+            'fc-item-2-delete': 0,
+            'fc-item-2-service': self.item_2.service,
+            'initial-fc-item-2-service': self.item_2.service,
+            'fc-item-2-video_id': self.item_2.video_id,
+        }
+        request = self.factory.post(url, data)
+
+        forms = self.admin.fc_get_forms(request, obj=self.area)
+        self.admin.fc_save_items(request, area=self.area, forms=forms)
+
+        self.assertEqual(request.POST['all_items_validated'], '1')
+        self.assertTrue(forms[1].is_unchanged())
+        self.assertFalse(hasattr(forms[1], 'cleaned_data'))
+        self.assertEqual(self.item_1.text, "Edited.")
+        self.assertEqual(self.item_2.modified, video_modified)
+
+    def test_fingerprint_changes_on_save(self):
+        """
+        If someone else saves the item after the form was rendered, the form
+        shouldn't count as unchanged.
+        """
+        fingerprint = self.item_2.get_form().get_fingerprint()
+        item = self.item_2
+        item.save()
+        self.assertNotEqual(item.get_form().get_fingerprint(), fingerprint)
+
     def test_fc_get_forms_POST_change(self):
         """
         Forms for existing items should always be bound and have a PK.
@@ -596,6 +1699,73 @@ class AdminUnitTest(TestDataMixin, TestCase):
         # Are there any existing items that weren't found in the forms?
         self.assertEqual(len(existing_item_pks), 0)
 
+    def test_fc_bulk_save(self):
+        """
+        Bulk saving should delete, reorder, and insert just like a normal save.
+        """
+        self.admin.fc_bulk_save = True
+        url = '/admin/test_app/myarea/{}/'.format(self.area.pk)
+        data = {
+            'title': "Our original area, saved in bulk",
+            'fc-prefixes': 'fc-item-1,fc-item-2,fc-item-3',
+            # Only move the first item.
+            'fc-item-1-pk': 1,
+            'fc-item-1-ct': ContentType.objects.get_for_model(PlainText).pk,
+            'fc-item-1-ordering': 3,
+            'fc-item-1-delete': 0,
+            'fc-item-1-text': self.item_1.text,
+            # Delete the second.
+            'fc-item-2-pk': 2,
+            'fc-item-2-ct': ContentType.objects.get_for_model(Video).pk,
+            'fc-item-2-ordering': 2,
+            'fc-item-2-delete': 1,
+            # And put a new one at the top.
+            'fc-item-3-ct': ContentType.objects.get_for_model(RawHTML).pk,
+            'fc-item-3-ordering': 1,
+            'fc-item-3-delete': 0,
+            'fc-item-3-html': "<p>New!</p>",
+        }
+        request = self.factory.post(url, data)
+        old_modified = self.item_1.modified
+
+        forms = self.admin.fc_get_forms(request, obj=self.area)
+        self.admin.fc_save_items(request, area=self.area, forms=forms)
+
+        self.assertEqual(request.POST['all_items_validated'], '1')
+        items = list(self.area.items)
+        self.assertEqual([type(i) for i in items], [RawHTML, PlainText])
+        self.assertEqual(items[0].html, data['fc-item-3-html'])
+        self.assertEqual(items[1].pk, 1)
+        self.assertEqual(items[1].ordering, 3)
+        self.assertNotEqual(items[1].modified, old_modified)
+        self.assertFalse(Video.objects.filter(pk=2).exists())
+
+    def test_fc_bulk_save_bad_ordering(self):
+        """
+        An ordering that isn't a whole number shouldn't be written by the
+        reordering shortcut; the form should fail validation instead.
+        """
+        self.admin.fc_bulk_save = True
+        url = '/admin/test_app/myarea/{}/'.format(self.area.pk)
+        for ordering in ('2.5', 'first', ''):
+            data = {
+                'title': self.area.title,
+                'fc-prefixes': 'fc-item-1',
+                'fc-item-1-pk': 1,
+                'fc-item-1-ct': (ContentType.objects.
+                                 get_for_model(PlainText).pk),
+                'fc-item-1-ordering': ordering,
+                'fc-item-1-delete': 0,
+                'fc-item-1-text': self.item_1.text,
+            }
+            request = self.factory.post(url, data)
+            forms = self.admin.fc_get_forms(request, obj=self.area)
+            self.assertIsNone(self.admin.fc_clean_ordering(forms[0]))
+            self.admin.fc_save_items(request, area=self.area, forms=forms)
+
+            self.assertEqual(request.POST['all_items_validated'], '0')
+            self.assertEqual(self.item_1.ordering, 1)
+
     def test_save_model(self):
         self.fail("You haven't finished this test yet.")
 
@@ -631,6 +1801,115 @@ class AdminIntegrationTest(TestDataMixin, TestCase):
         self.assertEqual(len(new_areas), 1)
         self.assertEqual(new_areas[0].title, data['title'])
 
+    def test_create_area_snapshot(self):
+        """
+        Creating an area in the admin should leave it with a snapshot of
+        all of its items.
+        """
+        existing_area_pks = tuple(MyArea.objects.values_list('pk', flat=True))
+        with self.settings(FLEXIBLE_CONTENT={'AREA_SNAPSHOTS': True}):
+            self.client.post('/admin/test_app/myarea/add/',
+                             self.data_for_another_area)
+        area = MyArea.objects.exclude(pk__in=existing_area_pks).get()
+        snapshot = AreaSnapshot.objects.get_for_area(area)
+        self.assertEqual([i['type'] for i in snapshot.get_items()],
+                         ['raw-html', 'plain-text'])
+
+    def test_form_templates(self):
+        """
+        The blank item forms should be served separately, with validators
+        that let browsers skip downloading them again.
+        """
+        url = '/admin/test_app/myarea/fc-form-templates.js'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith('var fcFormTemplates'))
+        for item_type in get_item_types():
+            self.assertIn('"{}"'.format(item_type.slug), response.content)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # The add page should point to the current version.
+        etag = response['ETag']
+        add_page = self.client.get('/admin/test_app/myarea/add/')
+        self.assertContains(add_page, '{}?v={}'.format(url, etag.strip('"')))
+
+        # If they've got it already, don't send it again.
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_form_templates_per_language(self):
+        """
+        Each language should get its own (cached) copy of the blank forms,
+        under its own version.
+        """
+        admin = ContentAreaAdmin(MyArea, AdminSite())
+        with translation.override('en'):
+            english = admin.fc_get_form_templates()
+        with translation.override('fr'):
+            french = admin.fc_get_form_templates()
+            self.assertNotEqual(english[0], french[0])
+            self.assertIn('?v={}'.format(french[0]),
+                          admin.fc_get_form_templates_url())
+        with translation.override('en'):
+            self.assertIs(admin.fc_get_form_templates(), english)
+
+    @override_settings(FLEXIBLE_CONTENT={'CACHE_TEMPLATES': True})
+    def test_form_templates_mtimes(self):
+        """
+        The forms' templates should only be checked for edits when the
+        template cache is off.
+        """
+        admin = ContentAreaAdmin(MyArea, AdminSite())
+        form_templates = admin.fc_get_form_templates()
+        checked = []
+        admin.fc_get_form_template_mtimes = lambda item_types: (
+            checked.append(item_types) or ())
+        self.assertIs(admin.fc_get_form_templates(), form_templates)
+        self.assertEqual(checked, [])
+
+        with self.settings(FLEXIBLE_CONTENT={'CACHE_TEMPLATES': False}):
+            admin.fc_get_form_templates()
+            del checked[:]
+            admin.fc_get_form_templates()
+            self.assertEqual(len(checked), 1)
+
+    def test_item_forms_page(self):
+        """
+        The change page should be able to fetch more item forms as JSON.
+        """
+        url = '/admin/test_app/myarea/{}/fc-item-forms/'.format(self.area.pk)
+        change_page = self.client.get('/admin/test_app/myarea/{}/'.
+                                      format(self.area.pk))
+        self.assertContains(change_page, escapejs(url))
+
+        response = self.client.get(url, {'offset': 1, 'prefix_start': 3})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['next_offset'], None)
+        self.assertIn('name="fc-item-3-pk"', data['html'])
+        self.assertNotIn('fc-item-4', data['html'])
+
+        response = self.client.get(url, {'offset': 'lots'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_change_prefetched_area(self):
+        """
+        An admin whose queryset prefetches items should still be able to
+        page through them on the change page.
+        """
+        MyAreaAdmin.queryset = lambda self, request: (
+            MyArea.objects.prefetch_items())
+        MyAreaAdmin.fc_items_per_page = 1
+        try:
+            response = self.client.get('/admin/test_app/myarea/{}/'.
+                                       format(self.area.pk))
+        finally:
+            del MyAreaAdmin.queryset
+            del MyAreaAdmin.fc_items_per_page
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'name="fc-item-1-pk"')
+        self.assertNotContains(response, 'name="fc-item-2-pk"')
+
     def test_create_area_with_items(self):
         # Ensure that we can create an area a few items.
 
@@ -660,6 +1939,27 @@ class AdminIntegrationTest(TestDataMixin, TestCase):
         self.assertEqual(new_items[0].html, data['fc-item-2-html'])
         self.assertEqual(new_items[1].text, data['fc-item-1-text'])
 
+        # The items should have been saved straight to the new area.
+        self.assertEqual(TemporaryArea.objects.count(), 0)
+
+    def test_create_area_with_invalid_items(self):
+        """
+        If an item doesn't validate, neither the area nor any of its items
+        should be saved.
+        """
+        url = '/admin/test_app/myarea/add/'
+        data = dict(self.data_for_another_area)
+        data['fc-item-1-text'] = ""  # This field can't be blank!
+        existing_area_count = MyArea.objects.count()
+        existing_item_count = BaseItem.objects.count()
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MyArea.objects.count(), existing_area_count)
+        self.assertEqual(BaseItem.objects.count(), existing_item_count)
+        self.assertEqual(TemporaryArea.objects.count(), 0)
+
     def test_update_area_delete_item(self):
         # Ensure that we can update an existing area and delete one item.
 
@@ -0,0 +1,7 @@
+from django.conf.urls import patterns, url
+
+
+urlpatterns = patterns('flexible_content.views',
+    url(r'^areas/(?P<app_label>\w+)/(?P<model_name>\w+)/(?P<pk>\d+)/'
+        r'items\.json$', 'area_items', name='flexible-content-area-items'),
+)
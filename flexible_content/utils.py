@@ -1,9 +1,20 @@
+from multiprocessing.pool import ThreadPool
+
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.db.models import get_model
+from django.utils.importlib import import_module
 from django.utils.translation import ugettext as _
 
 
+# How items are downcast to their real types when they're loaded:
+# - JOINED_LOADING uses a single query that LEFT JOINs every item type's table.
+# - SPLIT_LOADING queries the BaseItem rows first, then each type's table.
+JOINED_LOADING = 'joined'
+SPLIT_LOADING = 'split'
+ITEM_LOADING_STRATEGIES = (JOINED_LOADING, SPLIT_LOADING)
+
+
 def get_app_settings():
     """
     Load the settings and make sure it's not totally wrong.
@@ -23,6 +34,95 @@ def get_app_settings():
     return app_settings
 
 
+def iter_chunks(iterable, size):
+    """
+    Yield lists of up to `size` things from an iterable, without reading any
+    further ahead than that.
+    """
+    chunk = []
+    for thing in iterable:
+        chunk.append(thing)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_pk_batches(queryset, size, fields=()):
+    """
+    Yield the rows of a queryset in lists of up to `size`, in primary key
+    order. Each row is its primary key, or if any other fields are given, a
+    tuple of the primary key and those fields.
+
+    Each batch is its own short query, picking up after the last primary key
+    of the one before rather than using an OFFSET, so rows that are deleted
+    between batches don't cause any others to be skipped.
+    """
+    last_pk = None
+    while True:
+        qs = queryset.order_by('pk')
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        if fields:
+            rows = list(qs.values_list('pk', *fields)[:size])
+        else:
+            rows = list(qs.values_list('pk', flat=True)[:size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0] if fields else rows[-1]
+
+
+def threaded_map(func, things, threads):
+    """
+    Like map(), but calls func on up to `threads` threads at once. Meant for
+    things that spend their time waiting on the network.
+    """
+    things = list(things)
+    threads = min(len(things), threads)
+    if threads < 2:
+        return [func(t) for t in things]
+
+    pool = ThreadPool(threads)
+    try:
+        return pool.map(func, things)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_object_from_string(path, setting_name):
+    """
+    Import 'package.module.name' and return name. If that fails, blame the
+    FLEXIBLE_CONTENT setting it came from.
+    """
+    module_name, dot, name = path.rpartition('.')
+    try:
+        return getattr(import_module(module_name), name)
+    except (ImportError, AttributeError, ValueError):
+        message = _("Setting FLEXIBLE_CONTENT['{}'] is {!r}, which couldn't "
+                    "be imported.".format(setting_name, path))
+        raise ImproperlyConfigured(message)
+
+
+def get_item_loading(strategy=None):
+    """
+    Return the item loading strategy to use, falling back to the project's
+    FLEXIBLE_CONTENT['ITEM_LOADING'] setting (and then to joined loading) if
+    none is given.
+    """
+    if strategy is None:
+        strategy = get_app_settings().get('ITEM_LOADING', JOINED_LOADING)
+
+    if strategy not in ITEM_LOADING_STRATEGIES:
+        message = _("Item loading strategy should be one of {}; instead, it "
+                    "was {!r}.".format(ITEM_LOADING_STRATEGIES, strategy))
+        raise ImproperlyConfigured(message)
+
+    return strategy
+
+
 def get_model_from_string(model_string):
     """
     Take a list of 'app.ModelName' strings and return a list of model classes.
@@ -0,0 +1,69 @@
+"""
+A read-only JSON API for areas' items. Hook it up in your urls.py:
+    url(r'^flexible-content/', include('flexible_content.urls')),
+
+Then GET /flexible-content/areas/<app_label>/<model>/<pk>/items.json, e.g.
+/flexible-content/areas/blog/post/3/items.json. See serializers.py for what
+comes back.
+
+Responses carry an ETag and Last-Modified header worked out from one
+aggregate query over the area's items (and, with the area cache on, the
+area's cache version), so a client that sends them back gets a 304 without
+any items being loaded or serialized.
+
+Only areas whose model sets api_visible = True are served, and only the ones
+in its get_api_queryset(request).
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import get_model
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
+
+from .models import ContentArea
+from .serializers import get_area_version, serialize_area
+
+
+def get_area(request, app_label, model_name, pk):
+    """
+    Look up the requested area (once per request), or raise Http404.
+    """
+    area = getattr(request, '_fc_area', None)
+    if area is None:
+        model = get_model(app_label, model_name)
+        if (model is None or not issubclass(model, ContentArea) or
+                not model.api_visible):
+            raise Http404
+        area = get_object_or_404(model.get_api_queryset(request), pk=pk)
+        request._fc_area = area
+    return area
+
+
+def get_version(request, *args, **kwargs):
+    """
+    Return the area's (etag, last_modified), working it out once per request
+    even though condition() asks for each separately.
+    """
+    version = getattr(request, '_fc_area_version', None)
+    if version is None:
+        version = get_area_version(get_area(request, *args, **kwargs))
+        request._fc_area_version = version
+    return version
+
+
+def get_etag(request, *args, **kwargs):
+    return get_version(request, *args, **kwargs)[0]
+
+
+def get_last_modified(request, *args, **kwargs):
+    return get_version(request, *args, **kwargs)[1]
+
+
+@condition(etag_func=get_etag, last_modified_func=get_last_modified)
+def area_items(request, app_label, model_name, pk):
+    area = get_area(request, app_label, model_name, pk)
+    content = json.dumps(serialize_area(area), cls=DjangoJSONEncoder)
+    return HttpResponse(content, content_type='application/json')
@@ -7,6 +7,8 @@ from flexible_content.models import ContentArea, BaseItem
 class MyArea(ContentArea):
     title = models.CharField(max_length=50)
 
+    api_visible = True
+
 
 class MyItem(BaseItem):
     my_number = models.IntegerField()
@@ -17,6 +17,7 @@ urlpatterns = patterns('',
 
     # Uncomment the next line to enable the admin:
     url(r'^admin/', include(admin.site.urls)),
+    url(r'^flexible-content/', include('flexible_content.urls')),
 )
 # Serve static files
 urlpatterns += staticfiles_urlpatterns()